@@ -0,0 +1,117 @@
+# artifact_module.py
+import gzip
+import threading
+
+from botocore.exceptions import BotoCoreError, ClientError
+from dotenv import load_dotenv
+
+from aws_module import ARTIFACT_PREFIX
+from extraction_module import EXTRACTOR_VERSION, extraction_settings_key
+from metrics_module import span
+
+# Load environment variables
+load_dotenv()
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def artifact_key(file_key, etag, settings_key=None):
+    """
+    Builds the S3 key of the extracted-text artifact of one source object.
+
+    The extractor version, the output-affecting settings and the source ETag
+    are part of the key, so a changed object, a new extractor release or a
+    dashboard configured differently from the job simply finds no artifact.
+
+    Parameters:
+    - file_key (str): The S3 key of the source object.
+    - etag (str): The source object's ETag as reported by S3.
+    - settings_key (str, optional): extraction_settings_key() of the
+      extracting process; this process's by default.
+
+    Returns:
+    - str: The artifact key under ARTIFACT_PREFIX.
+    """
+    settings_key = settings_key or extraction_settings_key()
+    source_etag = (etag or '').strip('"')
+    return f"{ARTIFACT_PREFIX}v{settings_key}/{file_key}/{source_etag}.txt.gz"
+
+
+def get_extraction_artifact(s3_client, bucket_name, file_key, etag):
+    """
+    Returns the precomputed text of an object, or None when there is no
+    artifact for its current ETag and the current extraction settings.
+    Artifacts that cannot be read or decoded count as missing, so the caller
+    falls back to live extraction.
+    """
+    if not etag:
+        return None
+    try:
+        with span('artifact.get'):
+            response = s3_client.get_object(Bucket=bucket_name, Key=artifact_key(file_key, etag))
+            text = gzip.decompress(response['Body'].read()).decode('utf-8')
+    except Exception as e:
+        # Corrupt gzip (OSError, EOFError), bad UTF-8, S3 or transport errors
+        if not (isinstance(e, ClientError) and e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404')):
+            print(f"Error reading extraction artifact for {file_key}: {e}")
+        with _stats_lock:
+            _stats['misses'] += 1
+        return None
+    with _stats_lock:
+        _stats['hits'] += 1
+    return text
+
+
+def artifact_exists(s3_client, bucket_name, file_key, etag):
+    """
+    Checks for an up-to-date artifact without downloading it.
+    """
+    try:
+        s3_client.head_object(Bucket=bucket_name, Key=artifact_key(file_key, etag))
+    except (BotoCoreError, ClientError):
+        return False
+    return True
+
+
+def put_extraction_artifact(s3_client, bucket_name, file_key, etag, text):
+    """
+    Stores the extracted text of an object as a gzip artifact, with the
+    extractor version, the settings key and the source ETag as object
+    metadata.
+
+    Returns:
+    - int: Compressed size in bytes.
+    """
+    body = gzip.compress(text.encode('utf-8'))
+    settings_key = extraction_settings_key()
+    with span('artifact.put'):
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=artifact_key(file_key, etag, settings_key),
+            Body=body,
+            ContentType='text/plain; charset=utf-8',
+            ContentEncoding='gzip',
+            Metadata={
+                'extractor-version': str(EXTRACTOR_VERSION),
+                'extractor-settings': settings_key,
+                'source-etag': (etag or '').strip('"')
+            }
+        )
+    return len(body)
+
+
+def artifact_stats():
+    """
+    Returns the artifact hit/miss counters of this process.
+
+    Returns:
+    - dict: hits, misses and hit_rate (0.0 - 1.0).
+    """
+    with _stats_lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return {
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'hit_rate': (_stats['hits'] / lookups) if lookups else 0.0
+        }
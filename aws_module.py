@@ -1,39 +1,353 @@
 # aws_module.py
 import boto3
+import io
+import json
 import os
+import tempfile
+import threading
+import time
 from dotenv import load_dotenv
 
+from metrics_module import span, timed
+
 # 加載 .env 文件中的環境變數
 load_dotenv()
 
-def get_files_from_s3(bucket_name):
+# Where the local S3 catalog index is kept and how often it is refreshed
+DEFAULT_CATALOG_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gaia_dashboard")
+DEFAULT_CATALOG_REFRESH_SECONDS = 300
+
+# Sidecar prefix holding the precomputed extraction artifacts (preextract_to_s3.py);
+# it is not part of the task attachments
+ARTIFACT_PREFIX = os.getenv('EXTRACTION_ARTIFACT_PREFIX', '_extracted/')
+
+# Downloads up to this size are kept in memory; larger ones go to a temp file
+DOWNLOAD_SPOOL_BYTES = int(os.getenv('DOWNLOAD_SPOOL_BYTES', 32 * 1024 * 1024))
+# Cap on the bytes held in memory by all download buffers of the process
+DOWNLOAD_MEMORY_MAX_BYTES = int(os.getenv('DOWNLOAD_MEMORY_MAX_BYTES', 256 * 1024 * 1024))
+
+def get_s3_client():
     # 從環境變數中獲取 AWS 憑證
     aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
     aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
 
     # 初始化 S3 客戶端，使用從環境變數中讀取的憑證
-    s3 = boto3.client(
+    return boto3.client(
         's3',
         aws_access_key_id=aws_access_key_id,
         aws_secret_access_key=aws_secret_access_key
     )
 
+def iter_objects_from_s3(bucket_name, s3=None):
+    """
+    Yields every object summary in the bucket, following pagination past the
+    1000-key limit of a single list_objects_v2 call. Extraction artifacts
+    under ARTIFACT_PREFIX are left out.
+    """
+    s3 = s3 or get_s3_client()
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name):
+        for item in page.get('Contents', []):
+            if not item['Key'].startswith(ARTIFACT_PREFIX):
+                yield item
+
+@timed('s3.list')
+def get_files_from_s3(bucket_name):
     # 列出 S3 bucket 中的文件
-    response = s3.list_objects_v2(Bucket=bucket_name)
-    files = [item['Key'] for item in response.get('Contents', [])]
-    return files
+    return [item['Key'] for item in iter_objects_from_s3(bucket_name)]
 
 def download_file_from_s3(bucket_name, file_key, download_path):
-    # 從環境變數中獲取 AWS 憑證
-    aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
-    aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-
-    # 初始化 S3 客戶端
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key
-    )
+    s3 = get_s3_client()
 
     # 下載指定的文件
-    s3.download_file(bucket_name, file_key, download_path)
+    with span('s3.download'):
+        s3.download_file(bucket_name, file_key, download_path)
+
+
+class _MemoryBudget:
+    """Bytes that download buffers may still hold in memory, process-wide"""
+
+    def __init__(self, limit):
+        self.remaining = limit
+        self._lock = threading.Lock()
+
+    def reserve(self, size):
+        with self._lock:
+            if size > self.remaining:
+                return False
+            self.remaining -= size
+            return True
+
+    def release(self, size):
+        with self._lock:
+            self.remaining += size
+
+
+_memory_budget = _MemoryBudget(DOWNLOAD_MEMORY_MAX_BYTES)
+
+
+class DownloadBuffer:
+    """
+    Holds one downloaded object in memory and spills it to a named temp file
+    once it grows past DOWNLOAD_SPOOL_BYTES or the process-wide memory budget
+    (DOWNLOAD_MEMORY_MAX_BYTES) runs out. The temp file is deleted on close().
+
+    Only write() is exposed while downloading, so boto3 writes the parts in
+    order. Readers use .file (seeked to the start) or, once spilled, .path.
+    """
+
+    def __init__(self, size=None, suffix=''):
+        self.suffix = suffix
+        self.file = io.BytesIO()
+        self._reserved = 0
+        # Known to be too large: skip the memory buffer altogether
+        if size is not None and size > DOWNLOAD_SPOOL_BYTES:
+            self.rollover()
+
+    @property
+    def in_memory(self):
+        return isinstance(self.file, io.BytesIO)
+
+    @property
+    def path(self):
+        return None if self.in_memory else self.file.name
+
+    def write(self, data):
+        if self.in_memory:
+            size = len(data)
+            if self._reserved + size > DOWNLOAD_SPOOL_BYTES or not _memory_budget.reserve(size):
+                self.rollover()
+            else:
+                self._reserved += size
+        return self.file.write(data)
+
+    def rollover(self):
+        """
+        Moves the buffered bytes to a temp file and frees their memory.
+        """
+        if not self.in_memory:
+            return
+        spilled = tempfile.NamedTemporaryFile(suffix=self.suffix)
+        with self.file.getbuffer() as view:
+            spilled.write(view)
+        self.file.close()
+        self.file = spilled
+        _memory_budget.release(self._reserved)
+        self._reserved = 0
+
+    def getvalue(self):
+        """
+        Returns the content as bytes (a copy, e.g. to send it to another
+        process). Only valid while the buffer is in memory.
+        """
+        return self.file.getvalue()
+
+    def close(self):
+        self.file.close()
+        _memory_budget.release(self._reserved)
+        self._reserved = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def download_to_buffer(s3_client, bucket_name, file_key, size=None, suffix=''):
+    """
+    Downloads an object into a DownloadBuffer, positioned at the start.
+
+    Parameters:
+    - s3_client: A boto3 S3 client.
+    - bucket_name (str): The bucket holding the object.
+    - file_key (str): The object key.
+    - size (int, optional): Object size, if known; larger than
+      DOWNLOAD_SPOOL_BYTES goes straight to a temp file.
+    - suffix (str): Suffix of the temp file when the object spills to disk.
+
+    Returns:
+    - DownloadBuffer: The caller must close() it.
+    """
+    buffer = DownloadBuffer(size, suffix)
+    try:
+        with span('s3.download'):
+            s3_client.download_fileobj(bucket_name, file_key, buffer)
+        buffer.file.flush()
+        buffer.file.seek(0)
+    except BaseException:
+        buffer.close()
+        raise
+    return buffer
+
+
+class S3Catalog:
+    """
+    Locally persisted index of the bucket: task_id -> [key, size, ETag].
+
+    Lookups are dictionary reads and never list the bucket. refresh() pages
+    through the bucket and applies only the differences (new keys, keys whose
+    ETag or LastModified changed, removed keys) to the index, which is then
+    written back to index_path. start_background_refresh() keeps the index
+    current off the request path.
+    """
+
+    def __init__(self, bucket_name, index_path=None, s3=None):
+        self.bucket_name = bucket_name
+        self.index_path = index_path or os.path.join(
+            os.getenv('S3_CATALOG_DIR', DEFAULT_CATALOG_DIR), f"s3_catalog_{bucket_name}.json"
+        )
+        self._s3 = s3
+        # key -> {'size', 'etag', 'last_modified'}
+        self._objects = {}
+        # task_id -> list of file_info dicts
+        self._by_task = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresher = None
+
+    @staticmethod
+    def _file_info(key, entry):
+        file_base_name, file_ext = os.path.splitext(key)
+        return {
+            'file_name': key,
+            'file_ext': file_ext.lower(),
+            'size': entry['size'],
+            'etag': entry['etag']
+        }
+
+    def _rebuild_tasks(self, task_ids, objects):
+        by_task = dict(self._by_task)
+        for task_id in task_ids:
+            by_task.pop(task_id, None)
+        for key, entry in objects.items():
+            task_id = os.path.splitext(key)[0]
+            if task_id in task_ids:
+                by_task.setdefault(task_id, []).append(self._file_info(key, entry))
+        return by_task
+
+    def load(self):
+        """
+        Loads the persisted index, if any. Returns True when one was found.
+        """
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                objects = json.load(f)['objects']
+        except (FileNotFoundError, ValueError, KeyError):
+            return False
+        by_task = {}
+        for key, entry in objects.items():
+            by_task.setdefault(os.path.splitext(key)[0], []).append(self._file_info(key, entry))
+        with self._lock:
+            self._objects = objects
+            self._by_task = by_task
+            self._loaded = True
+        return True
+
+    def _save(self, objects):
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.index_path) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'bucket': self.bucket_name, 'updated_at': time.time(), 'objects': objects}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self):
+        """
+        Pages through the bucket and applies changes to the index.
+
+        Returns:
+        - int: Number of keys added, changed or removed.
+        """
+        with self._refresh_lock, span('s3.catalog_refresh'):
+            listed = {}
+            for item in iter_objects_from_s3(self.bucket_name, self._s3):
+                listed[item['Key']] = {
+                    'size': item['Size'],
+                    'etag': item['ETag'],
+                    'last_modified': item['LastModified'].isoformat()
+                }
+
+            with self._lock:
+                current = self._objects
+            changed_keys = {
+                key for key, entry in listed.items()
+                if key not in current
+                or current[key]['etag'] != entry['etag']
+                or current[key]['last_modified'] != entry['last_modified']
+            }
+            changed_keys.update(key for key in current if key not in listed)
+
+            if changed_keys or not self._loaded:
+                changed_tasks = {os.path.splitext(key)[0] for key in changed_keys}
+                by_task = self._rebuild_tasks(changed_tasks, listed)
+                with self._lock:
+                    self._objects = listed
+                    self._by_task = by_task
+                    self._loaded = True
+                self._save(listed)
+            return len(changed_keys)
+
+    def ensure_loaded(self):
+        """
+        Makes sure an index is available, listing the bucket only if there is
+        no persisted one yet.
+        """
+        if not self._loaded and not self.load():
+            self.refresh()
+
+    def files_for_task(self, task_id):
+        """
+        Returns the files of a task: list of {'file_name', 'file_ext', 'size', 'etag'}.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            return list(self._by_task.get(task_id, []))
+
+    def task_files_mapping(self):
+        """
+        Returns a snapshot of the whole task_id -> files mapping.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            return {task_id: list(files) for task_id, files in self._by_task.items()}
+
+    def start_background_refresh(self, interval=None):
+        """
+        Starts a daemon thread that refreshes the index every interval seconds.
+        """
+        interval = interval or float(os.getenv('S3_CATALOG_REFRESH_SECONDS', DEFAULT_CATALOG_REFRESH_SECONDS))
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_forever, args=(interval,), name="s3-catalog-refresh", daemon=True
+            )
+            self._refresher.start()
+
+    def _refresh_forever(self, interval):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing S3 catalog for {self.bucket_name}: {e}")
+            time.sleep(interval)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_s3_catalog(bucket_name, background_refresh=True):
+    """
+    Returns the process-wide catalog of a bucket, loading its persisted index
+    and starting the background refresh on first use.
+    """
+    with _catalogs_lock:
+        catalog = _catalogs.get(bucket_name)
+        if catalog is None:
+            catalog = S3Catalog(bucket_name, s3=get_s3_client())
+            catalog.load()
+            if background_refresh:
+                catalog.start_background_refresh()
+            _catalogs[bucket_name] = catalog
+        return catalog
@@ -0,0 +1,288 @@
+"""
+Headless batch evaluation over the GAIA task set.
+
+Runs every task (or only the requested Levels) through the same path as the
+dashboard: S3 attachments -> text extraction -> OpenAI, asks the model for an
+explicit 'FINAL ANSWER:' line, scores it against the annotated final answer,
+and bulk-inserts the outcomes into the Evaluations table. The rows carry
+sql_module.AUTOMATIC_EVALUATION_FEEDBACK as their feedback, so the dashboard
+reports count human judgments only.
+
+Progress is appended to a JSON-lines checkpoint file, so an interrupted run
+picks up where it stopped when started again with the same --checkpoint.
+
+Usage:
+    python batch_eval.py [--level 1 --level 2] [--concurrency 8] [--checkpoint batch_eval.jsonl]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import time
+
+import boto3
+from dotenv import load_dotenv
+
+from aws_module import get_s3_catalog
+from openai_module import async_send_to_openai
+from prompt_module import DEFAULT_TOKEN_BUDGET, abuild_prompt, count_tokens
+from pipeline_module import process_task_files, configure_pools
+from sql_module import AUTOMATIC_EVALUATION_FEEDBACK, get_metadata_from_sql, insert_evaluations_bulk
+from metrics_module import get_metrics_registry, start_exporters
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 8))
+DEFAULT_CHECKPOINT = 'batch_eval.jsonl'
+DEFAULT_FLUSH_SIZE = 25
+EXTRACTION_MAX_CHARS = int(os.getenv('EXTRACTION_MAX_CHARS', 400000))
+
+
+# Appended to every prompt so the response ends with an answer that can be
+# compared exactly
+FINAL_ANSWER_INSTRUCTION = (
+    "\n\nEnd your reply with a single line of the form 'FINAL ANSWER: <answer>', where <answer> is "
+    "only a number, as few words as possible, or a comma separated list of numbers and/or words."
+)
+# Relative tolerance when both answers are numbers
+NUMERIC_TOLERANCE = float(os.getenv('BATCH_NUMERIC_TOLERANCE', 1e-6))
+
+_FINAL_ANSWER = re.compile(r'final answer\s*:\s*(.+)', re.IGNORECASE)
+
+
+def normalize_answer(text):
+    """Lower-cases text and collapses punctuation and whitespace."""
+    return " ".join(re.findall(r'\w+', (text or "").lower()))
+
+
+def extract_final_answer(response):
+    """
+    Returns the answer from the last 'FINAL ANSWER:' line of a response, or
+    None if there is none.
+    """
+    matches = _FINAL_ANSWER.findall(response or "")
+    return matches[-1].strip() if matches else None
+
+
+def _parse_number(text):
+    # Allows currency and percent signs and thousands separators ("$1,234.5")
+    cleaned = re.sub(r'[\s$%€£]', '', text)
+    if re.fullmatch(r'[-+]?\d{1,3}(,\d{3})+(\.\d+)?', cleaned):
+        cleaned = cleaned.replace(',', '')
+    try:
+        number = float(cleaned)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _answers_match(answer, expected):
+    expected_number = _parse_number(expected)
+    if expected_number is not None:
+        number = _parse_number(answer)
+        return number is not None and math.isclose(number, expected_number, rel_tol=NUMERIC_TOLERANCE)
+    return normalize_answer(answer) == normalize_answer(expected)
+
+
+def is_response_correct(response, final_answer):
+    """
+    Scores a model response: correct when its 'FINAL ANSWER:' line equals the
+    annotated final answer after normalization. Numbers are compared with
+    NUMERIC_TOLERANCE, and comma or semicolon separated lists element by
+    element. A response without a final answer line is incorrect.
+    """
+    answer = extract_final_answer(response)
+    expected = (final_answer or "").strip()
+    if answer is None or not normalize_answer(expected):
+        return False
+    if _parse_number(expected) is None and re.search(r'[,;]', expected):
+        answers = re.split(r'[,;]', answer)
+        expected_items = re.split(r'[,;]', expected)
+        return len(answers) == len(expected_items) and all(
+            _answers_match(item, expected_item) for item, expected_item in zip(answers, expected_items)
+        )
+    return _answers_match(answer, expected)
+
+
+class Checkpoint:
+    """
+    Append-only JSON-lines log of finished tasks and of which of them have
+    already been written to the Evaluations table.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        self.flushed = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash; the task simply reruns
+                        continue
+                    if entry.get('type') == 'result':
+                        self.results[entry['task_id']] = entry
+                    elif entry.get('type') == 'flushed':
+                        self.flushed.update(entry['task_ids'])
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def pending_flush(self):
+        return [entry for task_id, entry in self.results.items() if task_id not in self.flushed]
+
+    def record_result(self, entry):
+        self.results[entry['task_id']] = entry
+        self._append(entry)
+
+    def record_flushed(self, task_ids):
+        self.flushed.update(task_ids)
+        self._append({'type': 'flushed', 'task_ids': list(task_ids)})
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class BatchRunner:
+    def __init__(self, checkpoint, concurrency, flush_size, write_results=True, use_cache=True):
+        self.checkpoint = checkpoint
+        self.use_cache = use_cache
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.flush_size = flush_size
+        self.write_results = write_results
+        self.s3_client = boto3.client('s3')
+        self.bucket_name = os.getenv('AWS_BUCKET')
+        self.task_files_mapping = {}
+        self._flush_lock = asyncio.Lock()
+
+    async def run(self, tasks):
+        # One up-to-date listing for the whole run
+        catalog = get_s3_catalog(self.bucket_name, background_refresh=False)
+        await asyncio.to_thread(catalog.refresh)
+        self.task_files_mapping = catalog.task_files_mapping()
+
+        # Results that finished before a crash but never reached the database
+        await self.flush(force=True)
+
+        todo = [task for task in tasks if task['task_id'] not in self.checkpoint.results]
+        print(f"{len(tasks) - len(todo)} tasks already done, {len(todo)} to run")
+        await asyncio.gather(*(self.run_task(task) for task in todo))
+        await self.flush(force=True)
+
+    async def run_task(self, task):
+        task_id = task['task_id']
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                extracted_text = ""
+                files_info = self.task_files_mapping.get(task_id, [])
+                if files_info:
+                    file_results = await asyncio.to_thread(
+                        process_task_files, self.s3_client, self.bucket_name, files_info, EXTRACTION_MAX_CHARS
+                    )
+                    for file_result in file_results:
+                        if file_result['text'] is not None:
+                            extracted_text += f"Extracted Text from {file_result['file_name']}:\n{file_result['text']}\n"
+
+                # Keep room for the final-answer instruction within the budget
+                prompt = await abuild_prompt(
+                    task['Steps'], task['Question'], extracted_text,
+                    token_budget=DEFAULT_TOKEN_BUDGET - count_tokens(FINAL_ANSWER_INSTRUCTION),
+                    use_cache=self.use_cache
+                )
+                response = await async_send_to_openai(prompt + FINAL_ANSWER_INSTRUCTION, use_cache=self.use_cache)
+            except Exception as e:
+                print(f"[{task_id}] failed: {e}")
+                return
+
+            entry = {
+                'type': 'result',
+                'task_id': task_id,
+                'level': task.get('Level'),
+                'final_answer': extract_final_answer(response),
+                'is_correct': is_response_correct(response, task['Final answer']),
+                'response': response,
+                'seconds': round(time.perf_counter() - start, 3)
+            }
+            self.checkpoint.record_result(entry)
+            print(f"[{task_id}] {'correct' if entry['is_correct'] else 'incorrect'} in {entry['seconds']}s")
+        await self.flush()
+
+    async def flush(self, force=False):
+        if not self.write_results:
+            return
+        async with self._flush_lock:
+            pending = self.checkpoint.pending_flush()
+            if not pending or (not force and len(pending) < self.flush_size):
+                return
+            evaluations = [
+                {
+                    'task_id': entry['task_id'],
+                    'is_correct': entry['is_correct'],
+                    'user_feedback': AUTOMATIC_EVALUATION_FEEDBACK
+                }
+                for entry in pending
+            ]
+            if await asyncio.to_thread(insert_evaluations_bulk, evaluations):
+                self.checkpoint.record_flushed([entry['task_id'] for entry in pending])
+            else:
+                print(f"Failed to write {len(pending)} evaluations; they will be retried")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--level', type=int, action='append', help="Only run tasks of this Level (repeatable)")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Maximum tasks in flight")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="JSON-lines progress file used to resume")
+    parser.add_argument('--flush-size', type=int, default=DEFAULT_FLUSH_SIZE, help="Evaluations per bulk insert")
+    parser.add_argument('--download-workers', type=int, help="Threads for S3 downloads")
+    parser.add_argument('--extract-workers', type=int, help="Processes for CPU-heavy extraction")
+    parser.add_argument('--dry-run', action='store_true', help="Do not write to the Evaluations table")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the OpenAI response cache and re-sample")
+    parser.add_argument('--timings', action='store_true', help="Print the per-stage latency summary at the end")
+    args = parser.parse_args()
+
+    start_exporters()
+
+    configure_pools(download_workers=args.download_workers, extract_workers=args.extract_workers)
+
+    tasks = get_metadata_from_sql()
+    if args.level:
+        tasks = [task for task in tasks if task.get('Level') in args.level]
+
+    checkpoint = Checkpoint(args.checkpoint)
+    runner = BatchRunner(
+        checkpoint, args.concurrency, args.flush_size,
+        write_results=not args.dry_run, use_cache=not args.no_cache
+    )
+    start = time.perf_counter()
+    try:
+        asyncio.run(runner.run(tasks))
+    finally:
+        checkpoint.close()
+
+    done = [checkpoint.results[task['task_id']] for task in tasks if task['task_id'] in checkpoint.results]
+    correct = sum(1 for entry in done if entry['is_correct'])
+    print(f"{len(done)}/{len(tasks)} tasks evaluated, {correct} correct, in {time.perf_counter() - start:.1f}s")
+
+    if args.timings:
+        for row in get_metrics_registry().summary():
+            print(
+                f"  {row['stage']:36} {row['count']:6d} calls  total {row['total_seconds']:8.2f}s  "
+                f"p50 {row['p50_seconds'] * 1000:8.1f} ms  p95 {row['p95_seconds'] * 1000:8.1f} ms"
+            )
+
+
+if __name__ == '__main__':
+    main()
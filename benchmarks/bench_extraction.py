@@ -0,0 +1,444 @@
+"""
+Offline extraction benchmark over every supported attachment type.
+
+Generates synthetic fixtures for each entry in SUPPORTED_EXTENSIONS in
+several size tiers, then runs extract_text_from_file on each fixture in a
+fresh interpreter and reports per format and tier:
+
+- latency percentiles (p50/p90/p99) and mean over --runs extractions,
+- throughput in input MB/s and extracted characters/s,
+- peak RSS of the process and its growth over the post-import baseline.
+
+Nothing is downloaded: OCR uses the locally installed EasyOCR models only
+(download disabled) and the OCR result cache is switched off so every run
+does the full work. Results are written as JSON (--output); --compare takes
+a previous results file and fails (exit code 1) when any p50 got slower by
+more than --max-regression (and by more than --min-seconds).
+
+Usage:
+    python benchmarks/bench_extraction.py [--runs 5] [--tiers small,medium]
+        [--formats .pdf,.xlsx] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Scale factor per size tier; every generator multiplies its unit by it
+TIERS = {'small': 1, 'medium': 10, 'large': 100}
+
+_WORDS = (
+    "the model reads attachments and extracts text for the prompt while the "
+    "benchmark measures latency throughput and memory of every format"
+).split()
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _pdf_bytes(pages, rng):
+    # Minimal PDF with one text content stream per page (no extra dependency)
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for index in range(pages):
+        page_id, content_id = 4 + 2 * index, 5 + 2 * index
+        kids.append(f"{page_id} 0 R")
+        lines = " T* ".join(f"({_sentence(rng)}) Tj" for _ in range(40))
+        stream = f"BT /F1 10 Tf 14 TL 50 750 Td {lines} ET".encode('latin-1')
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode('latin-1')
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode('latin-1')
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (object_id, objects[object_id])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for object_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[object_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _write_txt(path, scale, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(scale * 200):
+            f.write(_sentence(rng) + "\n")
+
+
+def _write_json(path, scale, rng):
+    records = [{'task_id': f"task-{i}", 'Question': _sentence(rng), 'Level': i % 3} for i in range(scale * 100)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f)
+
+
+def _write_csv(path, scale, rng):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'name', 'value', 'ratio', 'comment'])
+        for i in range(scale * 1000):
+            writer.writerow([i, rng.choice(_WORDS), rng.randint(0, 10 ** 6), rng.random(), _sentence(rng, 6)])
+
+
+def _write_pdb(path, scale, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("HEADER    SYNTHETIC PROTEIN\n")
+        for i in range(scale * 500):
+            f.write(
+                f"ATOM  {i % 100000:5d}  CA  ALA A{i % 10000:4d}    "
+                f"{rng.uniform(-50, 50):8.3f}{rng.uniform(-50, 50):8.3f}{rng.uniform(-50, 50):8.3f}"
+                f"  1.00{rng.uniform(0, 60):6.2f}           C\n"
+            )
+        f.write("END\n")
+
+
+def _write_py(path, scale, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(scale * 100):
+            f.write(f"def function_{i}(value):\n    \"\"\"{_sentence(rng)}\"\"\"\n    return value * {i}\n\n\n")
+
+
+def _write_pdf(path, scale, rng):
+    with open(path, 'wb') as f:
+        f.write(_pdf_bytes(scale, rng))
+
+
+def _write_docx(path, scale, rng):
+    import docx
+
+    document = docx.Document()
+    for _ in range(scale * 50):
+        document.add_paragraph(" ".join(_sentence(rng) for _ in range(3)))
+    document.save(path)
+
+
+def _write_pptx(path, scale, rng):
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    presentation = Presentation()
+    for _ in range(scale * 2):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = _sentence(rng, 4)
+        slide.placeholders[1].text = "\n".join(_sentence(rng) for _ in range(5))
+        box = slide.shapes.add_textbox(Inches(1), Inches(6), Inches(6), Inches(1))
+        box.text = _sentence(rng)
+    presentation.save(path)
+
+
+def _write_xlsx(path, scale, rng):
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet_index in range(2):
+        sheet = workbook.create_sheet(f"Sheet{sheet_index + 1}")
+        sheet.append(['id', 'name', 'value', 'ratio', 'date', 'comment', 'flag', 'score'])
+        for i in range(scale * 250):
+            sheet.append([
+                i, rng.choice(_WORDS), rng.randint(0, 10 ** 6), rng.random(),
+                datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 365),
+                _sentence(rng, 6), i % 2 == 0, rng.uniform(0, 100)
+            ])
+    workbook.save(path)
+
+
+def _image(scale, rng):
+    from PIL import Image, ImageDraw
+
+    # small 400x200, medium ~1265x632, large 4000x2000
+    width = int(400 * scale ** 0.5)
+    height = width // 2
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    line_height = 14
+    for row in range(0, height - line_height, line_height * 2):
+        draw.text((10, row + 4), _sentence(rng, max(3, width // 60)), fill='black')
+    return image
+
+
+def _write_png(path, scale, rng):
+    _image(scale, rng).save(path, 'PNG')
+
+
+def _write_jpg(path, scale, rng):
+    _image(scale, rng).save(path, 'JPEG', quality=90)
+
+
+def _write_zip(path, scale, rng):
+    # A mix of streamed and buffered members plus one unsupported member
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for i in range(scale):
+                for ext, writer in (('.txt', _write_txt), ('.csv', _write_csv), ('.py', _write_py), ('.pdf', _write_pdf)):
+                    member_path = os.path.join(tmpdir, f"member_{i}{ext}")
+                    writer(member_path, 1, rng)
+                    archive.write(member_path, f"docs/member_{i}{ext}")
+            archive.writestr('audio/clip.mp3', rng.randbytes(64 * 1024))
+
+
+FIXTURE_WRITERS = {
+    '.json': _write_json,
+    '.pdf': _write_pdf,
+    '.png': _write_png,
+    '.jpeg': _write_jpg,
+    '.jpg': _write_jpg,
+    '.txt': _write_txt,
+    '.xlsx': _write_xlsx,
+    '.csv': _write_csv,
+    '.pptx': _write_pptx,
+    '.docx': _write_docx,
+    '.py': _write_py,
+    '.zip': _write_zip,
+    '.pdb': _write_pdb,
+}
+
+
+def make_fixture(directory, ext, tier):
+    """
+    Writes the fixture for one format and tier; the same seed always yields
+    the same file.
+
+    Returns:
+    - str: Path of the fixture.
+    """
+    path = os.path.join(directory, f"fixture_{tier}{ext}")
+    if not os.path.exists(path):
+        FIXTURE_WRITERS[ext](path, TIERS[tier], random.Random(f"{ext}:{tier}"))
+    return path
+
+
+_WORKER_SNIPPET = """
+import json, resource, sys, time
+sys.path.insert(0, {repo_root!r})
+
+def rss_bytes():
+    # VmHWM belongs to this process image; ru_maxrss on Linux also carries
+    # the parent's peak over fork/exec
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+import resource_module
+
+def build_offline_reader():
+    import easyocr
+    return easyocr.Reader(['en'], gpu=False, download_enabled=False, verbose=False)
+
+resource_module.resource_manager.register('ocr_reader', build_offline_reader)
+
+from extraction_module import ExtractionError, extract_text_from_file
+
+def extract():
+    try:
+        return extract_text_from_file({path!r}), None
+    except ExtractionError as e:
+        return "", str(e)
+
+# Warm-up: imports the extractor and loads models outside the measurement
+start = time.perf_counter()
+text, error = extract()
+warmup = time.perf_counter() - start
+baseline = rss_bytes()
+
+samples = []
+for _ in range({runs}):
+    start = time.perf_counter()
+    text, error = extract()
+    samples.append(time.perf_counter() - start)
+
+print(json.dumps({{
+    'samples': samples,
+    'warmup_seconds': warmup,
+    'chars': len(text),
+    'error': error,
+    'baseline_rss_bytes': baseline,
+    'peak_rss_bytes': rss_bytes()
+}}))
+"""
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_case(path, runs):
+    """
+    Extracts one fixture runs times in a fresh interpreter.
+
+    Returns:
+    - dict: Latency, throughput and memory figures for the fixture.
+    """
+    env = dict(os.environ)
+    # Every run must do the full OCR work
+    env['OCR_CACHE_MAX_BYTES'] = '0'
+    env['OCR_CACHE_DIR'] = os.path.join(os.path.dirname(path), 'ocr_cache')
+    result = subprocess.run(
+        [sys.executable, '-c', _WORKER_SNIPPET.format(repo_root=REPO_ROOT, path=path, runs=runs)],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        return {'error': (result.stderr.strip().splitlines() or ['worker failed'])[-1]}
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+
+    samples = measured['samples']
+    size = os.path.getsize(path)
+    mean = statistics.fmean(samples)
+    return {
+        'input_bytes': size,
+        'chars': measured['chars'],
+        'runs': len(samples),
+        'warmup_seconds': measured['warmup_seconds'],
+        'mean_seconds': mean,
+        'p50_seconds': _percentile(samples, 0.50),
+        'p90_seconds': _percentile(samples, 0.90),
+        'p99_seconds': _percentile(samples, 0.99),
+        'mb_per_second': size / 1e6 / mean if mean else None,
+        'chars_per_second': measured['chars'] / mean if mean else None,
+        'peak_rss_bytes': measured['peak_rss_bytes'],
+        'rss_growth_bytes': measured['peak_rss_bytes'] - measured['baseline_rss_bytes'],
+        'error': measured['error']
+    }
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression, min_seconds):
+    """
+    Prints the p50 change per case against a previous results file.
+
+    Returns:
+    - list of str: Cases whose p50 grew by more than max_regression and by
+      more than min_seconds (timer noise on sub-millisecond cases).
+    """
+    regressions = []
+    for case, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(case)
+        if not previous or current.get('p50_seconds') is None or not previous.get('p50_seconds'):
+            continue
+        ratio = current['p50_seconds'] / previous['p50_seconds']
+        marker = ""
+        if ratio > 1 + max_regression and current['p50_seconds'] - previous['p50_seconds'] > min_seconds:
+            regressions.append(case)
+            marker = "  REGRESSION"
+        print(f"  {case:16} p50 {previous['p50_seconds'] * 1000:9.1f} -> {current['p50_seconds'] * 1000:9.1f} ms ({ratio:5.2f}x){marker}")
+    return regressions
+
+
+def main():
+    from extraction_module import SUPPORTED_EXTENSIONS, EXTRACTOR_VERSION
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="Measured extractions per fixture")
+    parser.add_argument('--tiers', default=','.join(TIERS), help="Comma-separated size tiers")
+    parser.add_argument('--formats', default=','.join(SUPPORTED_EXTENSIONS), help="Comma-separated extensions")
+    parser.add_argument('--fixtures-dir', help="Keep fixtures here between runs (default: a temp dir)")
+    parser.add_argument('--output', default='bench_extraction.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', help="Previous results file to compare p50 latencies against")
+    parser.add_argument('--max-regression', type=float, default=0.25, help="Allowed p50 slowdown (0.25 = 25%%)")
+    parser.add_argument('--min-seconds', type=float, default=0.005, help="Ignore p50 changes smaller than this")
+    args = parser.parse_args()
+
+    tiers = [tier for tier in args.tiers.split(',') if tier]
+    formats = [ext for ext in args.formats.split(',') if ext]
+    for tier in tiers:
+        if tier not in TIERS:
+            parser.error(f"unknown tier: {tier}")
+    for ext in formats:
+        if ext not in FIXTURE_WRITERS:
+            parser.error(f"no fixture generator for: {ext}")
+
+    results = {
+        'commit': _git_commit(),
+        'extractor_version': EXTRACTOR_VERSION,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'runs': args.runs,
+        'cases': {}
+    }
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fixtures_dir = args.fixtures_dir or tmpdir
+        os.makedirs(fixtures_dir, exist_ok=True)
+        print(f"{'case':16} {'size':>10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'MB/s':>8} {'peak RSS':>9}")
+        for ext in formats:
+            for tier in tiers:
+                case = f"{ext}:{tier}"
+                try:
+                    path = make_fixture(fixtures_dir, ext, tier)
+                except ImportError as e:
+                    results['cases'][case] = {'error': f"fixture unavailable: {e}"}
+                    print(f"{case:16} skipped ({e})")
+                    continue
+                measured = run_case(path, args.runs)
+                results['cases'][case] = measured
+                if 'p50_seconds' not in measured:
+                    print(f"{case:16} failed ({measured['error']})")
+                    continue
+                print(
+                    f"{case:16} {measured['input_bytes'] / 1024:8.0f}KB "
+                    f"{measured['p50_seconds'] * 1000:9.1f} {measured['p90_seconds'] * 1000:9.1f} "
+                    f"{measured['p99_seconds'] * 1000:9.1f} {measured['mb_per_second']:8.2f} "
+                    f"{measured['peak_rss_bytes'] / 2 ** 20:7.0f}MB"
+                    + (f"  ({measured['error'][:60]})" if measured['error'] else "")
+                )
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} ({baseline.get('commit')}):")
+        regressions = compare(results, baseline, args.max_regression, args.min_seconds)
+        if regressions:
+            print(f"FAIL: p50 regressed by more than {args.max_regression * 100:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
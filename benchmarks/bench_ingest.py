@@ -0,0 +1,133 @@
+"""
+Offline throughput benchmark for upload_data_to_s3.py.
+
+Serves synthetic files from a local HTTP server laid out like the Hugging Face
+dataset page and uploads them to a local moto S3 server, once cold and once
+more to measure the resume/skip path. Requires moto[server].
+
+Usage:
+    python benchmarks/bench_ingest.py [--files 40] [--size-mb 4] [--workers 8]
+"""
+import argparse
+import functools
+import hashlib
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+BUCKET_NAME = 'bench-ingest'
+
+
+class _DatasetHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves an index page of <li><a href=".../blob/<name>"> links at / and the
+    files themselves at .../resolve/<name>, with an ETag like Hugging Face.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def _file_path(self):
+        name = self.path.rsplit('/resolve/', 1)[-1]
+        return os.path.join(self.directory, os.path.basename(name))
+
+    def _send_file_headers(self, path):
+        with open(path, 'rb') as f:
+            etag = hashlib.md5(f.read(1024 * 1024)).hexdigest()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(os.path.getsize(path)))
+        self.send_header('ETag', f'"{etag}"')
+        self.end_headers()
+
+    def do_HEAD(self):
+        if '/resolve/' not in self.path:
+            return super().do_HEAD()
+        self._send_file_headers(self._file_path())
+
+    def do_GET(self):
+        if '/resolve/' not in self.path:
+            names = sorted(os.listdir(self.directory))
+            body = "<ul>" + "".join(f'<li><a href="/data/blob/{name}">{name}</a></li>' for name in names) + "</ul>"
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        path = self._file_path()
+        self._send_file_headers(path)
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(1024 * 1024)
+                if not block:
+                    break
+                self.wfile.write(block)
+
+
+def _make_fixtures(directory, files, size_mb):
+    block = os.urandom(1024 * 1024)
+    for index in range(files):
+        with open(os.path.join(directory, f"file_{index:04d}.pdf"), 'wb') as f:
+            for _ in range(size_mb):
+                f.write(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=40)
+    parser.add_argument('--size-mb', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    from moto.server import ThreadedMotoServer
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+    import upload_data_to_s3 as ingest
+
+    with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as work_dir:
+        _make_fixtures(data_dir, args.files, args.size_mb)
+
+        handler = functools.partial(_DatasetHandler, directory=data_dir)
+        http_server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=http_server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{http_server.server_address[1]}"
+
+        s3_server = ThreadedMotoServer(ip_address='127.0.0.1', port=0)
+        s3_server.start()
+        endpoint_url = f"http://127.0.0.1:{s3_server._server.server_port}"
+
+        try:
+            session = ingest.make_http_session(pool_size=args.workers)
+            s3_client = ingest.make_s3_client(endpoint_url, pool_size=args.workers)
+            s3_client.create_bucket(Bucket=BUCKET_NAME)
+            manifest = ingest.UploadManifest(os.path.join(work_dir, 'manifest.json'))
+
+            for label in ('cold', 'resume'):
+                start = time.perf_counter()
+                stats = ingest.process_files_and_upload(
+                    f"{base_url}/", BUCKET_NAME, session, s3_client, manifest,
+                    workers=args.workers, base_url=base_url
+                )
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{label:6}: {stats['uploaded']} uploaded, {stats['skipped']} skipped, "
+                    f"{stats['failed']} failed, {stats['bytes'] / 1e6 / elapsed:.1f} MB/s ({elapsed:.2f}s)"
+                )
+        finally:
+            http_server.shutdown()
+            s3_server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Cold-start benchmark for the dashboard.
+
+Imports the modules streamlit_app.py imports at top level (read from its
+source, without the streamlit and plotly UI frameworks) in a fresh
+interpreter several times and fails (exit code 1) if
+
+- the median import time exceeds --max-seconds, or
+- any heavy extraction dependency (easyocr, torch, PyPDF2, ...) was imported
+  eagerly instead of on first use.
+
+With --formats it also reports the per-format extractor import cost as seen
+by the lazy registry.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--max-seconds 2.0] [--formats]
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_PATH = os.path.join(REPO_ROOT, 'streamlit_app.py')
+
+# UI frameworks; their import cost does not depend on this repo
+EXCLUDED_MODULES = {'streamlit', 'plotly'}
+
+# Dependencies that must only be imported when their format is first seen
+LAZY_MODULES = ['easyocr', 'torch', 'PyPDF2', 'docx', 'openpyxl', 'pptx']
+
+_STARTUP_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+eager = [name for name in {lazy!r} if name in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'eager': eager}}))
+"""
+
+_FORMAT_SNIPPET = """
+import json
+from extraction_module import get_extractor, get_import_costs
+try:
+    get_extractor({ext!r})
+    print(json.dumps(get_import_costs()))
+except ImportError as e:
+    print(json.dumps({{'error': str(e)}}))
+"""
+
+
+def startup_modules(app_path=APP_PATH):
+    """
+    Returns the modules imported at the top level of app_path, in import
+    order, leaving out EXCLUDED_MODULES.
+    """
+    with open(app_path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=app_path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if name.split('.')[0] not in EXCLUDED_MODULES and name not in modules:
+                modules.append(name)
+    return modules
+
+
+def _run_snippet(snippet):
+    result = subprocess.run(
+        [sys.executable, '-c', snippet],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(runs, modules):
+    snippet = _STARTUP_SNIPPET.format(modules=modules, lazy=LAZY_MODULES)
+    samples = []
+    eager = set()
+    for _ in range(runs):
+        result = _run_snippet(snippet)
+        samples.append(result['seconds'])
+        eager.update(result['eager'])
+    return samples, sorted(eager)
+
+
+def measure_format_costs():
+    from extraction_module import EXTRACTOR_MODULES
+
+    costs = {}
+    for ext in EXTRACTOR_MODULES:
+        result = _run_snippet(_FORMAT_SNIPPET.format(ext=ext))
+        costs[ext] = result.get(ext, result.get('error'))
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=float(os.getenv('STARTUP_MAX_SECONDS', 2.0)))
+    parser.add_argument('--formats', action='store_true', help="Also report per-format import cost")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    modules = startup_modules()
+    samples, eager = measure_startup(args.runs, modules)
+    median = statistics.median(samples)
+    print(f"Cold start of {len(modules)} modules (median of {args.runs}): {median * 1000:.1f} ms "
+          f"(budget {args.max_seconds * 1000:.0f} ms)")
+
+    if args.formats:
+        for ext, cost in measure_format_costs().items():
+            if isinstance(cost, float):
+                print(f"  {ext:6} {cost * 1000:8.1f} ms")
+            else:
+                print(f"  {ext:6} unavailable ({cost})")
+
+    failed = False
+    if eager:
+        print(f"FAIL: imported eagerly at startup: {', '.join(eager)}")
+        failed = True
+    if median > args.max_seconds:
+        print("FAIL: cold start exceeds budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Default location and size bound of the on-disk extraction cache
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gaia_dashboard", "extraction")
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Default location and size bound of the OCR result cache (keyed by image hash)
+DEFAULT_OCR_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gaia_dashboard", "ocr")
+DEFAULT_OCR_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Default location, lifetime and size bound of the OpenAI response cache
+DEFAULT_RESPONSE_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "gaia_dashboard", "responses.sqlite3")
+DEFAULT_RESPONSE_CACHE_TTL = 7 * 24 * 3600
+DEFAULT_RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ExtractionCache:
+    """
+    Persistent, size-bounded cache of extracted attachment text.
+
+    Entries are content-addressed by (bucket, key, ETag, extractor version), so a
+    changed object or a new extractor release never serves stale text. Each entry
+    is a single UTF-8 file; its mtime is bumped on every hit and the least recently
+    used entries are evicted once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(bucket_name, file_key, etag, extractor_version):
+        """
+        Builds the cache key for one S3 object.
+
+        Parameters:
+        - bucket_name (str): The S3 bucket holding the object.
+        - file_key (str): The S3 key of the object.
+        - etag (str): The object's ETag as reported by S3.
+        - extractor_version (str): Version of the extraction code.
+
+        Returns:
+        - str: A hex digest identifying the extracted text.
+        """
+        raw = "\0".join([bucket_name or "", file_key, (etag or "").strip('"'), str(extractor_version)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, key):
+        """
+        Returns the cached text for key, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key, text):
+        """
+        Stores text under key and evicts least recently used entries if needed.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        # Atomic rename so concurrent readers never see a partial entry
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".txt"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        # Oldest access time first
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        """
+        Returns the hit/miss counters of this process.
+
+        Returns:
+        - dict: hits, misses, evictions and hit_rate (0.0 - 1.0).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
+
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """
+    Returns the process-wide extraction cache, configured from the environment
+    (EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES).
+    """
+    global _extraction_cache
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = ExtractionCache(
+                cache_dir=os.getenv('EXTRACTION_CACHE_DIR', DEFAULT_CACHE_DIR),
+                max_bytes=int(os.getenv('EXTRACTION_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES))
+            )
+        return _extraction_cache
+
+
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """
+    Returns the process-wide OCR result cache, configured from the environment
+    (OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES). Keys are image content hashes, so
+    the same image is recognized once whether it arrives on its own, inside a
+    ZIP or embedded in a PDF.
+    """
+    global _ocr_cache
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            _ocr_cache = ExtractionCache(
+                cache_dir=os.getenv('OCR_CACHE_DIR', DEFAULT_OCR_CACHE_DIR),
+                max_bytes=int(os.getenv('OCR_CACHE_MAX_BYTES', DEFAULT_OCR_CACHE_MAX_BYTES))
+            )
+        return _ocr_cache
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of chat completion responses.
+
+    Entries are keyed by a hash of everything that determines the request
+    (model, temperature, max_tokens, system prompt and user prompt), expire
+    after ttl seconds and are evicted least recently used first once the
+    stored responses exceed max_bytes.
+    """
+
+    def __init__(self, path=DEFAULT_RESPONSE_CACHE_PATH, ttl=DEFAULT_RESPONSE_CACHE_TTL,
+                 max_bytes=DEFAULT_RESPONSE_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)')
+
+    @staticmethod
+    def make_key(model, temperature, max_tokens, system_prompt, prompt):
+        """
+        Builds the cache key for one chat completion request.
+
+        Returns:
+        - str: A hex digest of the request parameters.
+        """
+        raw = json.dumps([model, temperature, max_tokens, system_prompt, prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached response for key, or None if missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT response, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.misses += 1
+                return None
+            self._connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        """
+        Stores a response and evicts expired and least recently used entries.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, response, len(response.encode("utf-8")), now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._connection.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl,))
+        total = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._connection.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall()
+        stale_keys = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        self._connection.executemany('DELETE FROM responses WHERE key = ?', stale_keys)
+
+    def stats(self):
+        """
+        Returns the hit/miss counters of this process.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Returns the process-wide response cache, configured from the environment
+    (RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_BYTES).
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                path=os.getenv('RESPONSE_CACHE_PATH', DEFAULT_RESPONSE_CACHE_PATH),
+                ttl=float(os.getenv('RESPONSE_CACHE_TTL', DEFAULT_RESPONSE_CACHE_TTL)),
+                max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', DEFAULT_RESPONSE_CACHE_MAX_BYTES))
+            )
+        return _response_cache
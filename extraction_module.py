@@ -0,0 +1,239 @@
+import hashlib
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics_module import timed_iter
+
+# Supported file types
+SUPPORTED_EXTENSIONS = [
+    '.json', '.pdf', '.png', '.jpeg', '.jpg', '.txt',
+    '.xlsx', '.csv', '.pptx', '.docx', '.py', '.zip', '.pdb'
+]
+
+# Bump whenever extraction output changes so cached text is not reused
+EXTRACTOR_VERSION = "6"
+
+# Environment settings that change extraction output. Their values are part of
+# extraction_settings_key(); changed defaults are covered by EXTRACTOR_VERSION.
+OUTPUT_SETTINGS = (
+    'TABULAR_MODE', 'TABULAR_SUMMARY_MIN_ROWS', 'TABULAR_SUMMARY_MIN_BYTES', 'TABULAR_SAMPLE_ROWS',
+    'PDF_MAX_PAGES', 'PDF_OCR_FALLBACK',
+    'ZIP_MAX_TOTAL_BYTES', 'ZIP_MAX_DEPTH',
+    'OCR_TARGET_DPI', 'OCR_MAX_SIDE',
+)
+
+# Upper bound on the size of a single chunk yielded by iter_text_from_file
+DEFAULT_CHUNK_CHARS = 64 * 1024
+
+# Processes for CPU-heavy extraction. All OCR of a replica runs in this one
+# pool, so at most EXTRACT_WORKERS OCR readers are loaded at a time.
+EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', max(1, min(4, (os.cpu_count() or 1)))))
+
+# Extension -> module implementing iter_text(source), where source is a path
+# or a readable binary file object. Modules are only
+# imported the first time their format is seen, so heavy dependencies such as
+# easyocr/torch, PyPDF2 or openpyxl stay out of the dashboard's cold start.
+EXTRACTOR_MODULES = {
+    '.txt': 'extractors.text_extractor',
+    '.json': 'extractors.text_extractor',
+    '.pdf': 'extractors.pdf_extractor',
+    '.docx': 'extractors.docx_extractor',
+    '.csv': 'extractors.csv_extractor',
+    '.xlsx': 'extractors.xlsx_extractor',
+    '.png': 'extractors.image_extractor',
+    '.jpg': 'extractors.image_extractor',
+    '.jpeg': 'extractors.image_extractor',
+    '.py': 'extractors.py_extractor',
+    '.zip': 'extractors.zip_extractor',
+    '.pdb': 'extractors.pdb_extractor',
+    '.pptx': 'extractors.pptx_extractor',
+}
+
+
+class ExtractionError(Exception):
+    """Raised when a file cannot be extracted (completely)."""
+
+
+_loaded_extractors = {}
+_import_costs = {}
+_registry_lock = threading.Lock()
+
+_extract_workers = EXTRACT_WORKERS
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+
+def configure_extract_pool(workers):
+    """
+    Sets the number of extract pool processes. An existing pool is recreated
+    on next use.
+    """
+    global _extract_workers, _extract_pool
+    with _extract_pool_lock:
+        if workers != _extract_workers:
+            _extract_workers = workers
+            if _extract_pool is not None:
+                _extract_pool.shutdown(wait=False)
+                _extract_pool = None
+
+
+def get_extract_pool():
+    """
+    Returns the process-wide pool for CPU-heavy extraction (OCR, archives),
+    creating it on first use. Jobs running in it must not submit to it.
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            # spawn: the dashboard process is multi-threaded, forking it is unsafe
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=_extract_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _extract_pool
+
+
+def reset_extract_pool():
+    """
+    Drops the extract pool after a worker died (e.g. out of memory); a fresh
+    one is started on next use.
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is not None:
+            _extract_pool.shutdown(wait=False)
+            _extract_pool = None
+
+
+def get_extractor(ext):
+    """
+    Returns the iter_text generator function for a file extension, importing
+    its module on first use.
+
+    Parameters:
+    - ext (str): Lower-case file extension including the dot.
+
+    Returns:
+    - callable or None: The extractor, or None if the extension is unsupported.
+    """
+    module_name = EXTRACTOR_MODULES.get(ext)
+    if module_name is None:
+        return None
+
+    with _registry_lock:
+        module = _loaded_extractors.get(module_name)
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            _import_costs[module_name] = time.perf_counter() - start
+            _loaded_extractors[module_name] = module
+    return module.iter_text
+
+
+def extraction_settings_key():
+    """
+    Identifies the extractor version together with the output-affecting
+    settings (OUTPUT_SETTINGS) of this process, for use in cache keys: text
+    extracted in 'summary' tabular mode is never served in 'full' mode.
+
+    Returns:
+    - str: e.g. "6-1f3a9c0d2b4e".
+    """
+    settings = "\0".join(f"{name}={os.getenv(name, '')}" for name in OUTPUT_SETTINGS)
+    return f"{EXTRACTOR_VERSION}-{hashlib.sha256(settings.encode('utf-8')).hexdigest()[:12]}"
+
+
+def get_import_costs():
+    """
+    Reports how long each format's extractor took to import.
+
+    Returns:
+    - dict: Extension -> import time in seconds, for formats loaded so far.
+    """
+    with _registry_lock:
+        return {
+            ext: _import_costs[module_name]
+            for ext, module_name in EXTRACTOR_MODULES.items()
+            if module_name in _import_costs
+        }
+
+
+def iter_text_from_file(file_path, chunk_chars=DEFAULT_CHUNK_CHARS, ext=None):
+    """
+    Streams the text of a file as chunks of at most chunk_chars characters.
+
+    The underlying extractor only does as much work as the consumer pulls, so
+    closing the generator early (e.g. once a prompt has enough context) skips
+    the remaining pages, rows or archive members.
+
+    Parameters:
+    - file_path (str or file object): Path of the file to extract, or a
+      readable binary file object (e.g. a ZIP member).
+    - chunk_chars (int): Maximum length of each yielded chunk.
+    - ext (str, optional): File extension; taken from the path or the file
+      object's name when omitted.
+
+    Yields:
+    - str: Consecutive pieces of the extracted text.
+
+    Raises:
+    - ExtractionError: The type is unsupported or the extractor failed,
+      possibly after some chunks were already yielded.
+    """
+    if ext is None:
+        name = file_path if isinstance(file_path, (str, os.PathLike)) else getattr(file_path, 'name', '')
+        _, ext = os.path.splitext(str(name or ''))
+    ext = ext.lower()
+
+    try:
+        extractor = get_extractor(ext)
+        if extractor is None:
+            raise ExtractionError(f"Unsupported file type: {ext}")
+        chunks = extractor(file_path)
+        # Time spent inside the extractor, recorded per format
+        chunks = timed_iter(f"extract{ext}", chunks)
+        for chunk in chunks:
+            for start in range(0, len(chunk), chunk_chars):
+                yield chunk[start:start + chunk_chars]
+
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"Error processing file: {e}") from e
+
+
+# Function to extract text from different file types
+def extract_text_from_file(file_path, max_chars=None, ext=None):
+    """
+    Extracts the text of a file, stopping once max_chars characters are read.
+
+    Parameters:
+    - file_path (str or file object): Path of the file to extract, or a
+      readable binary file object.
+    - max_chars (int, optional): Truncate the text to this many characters.
+    - ext (str, optional): File extension, required for unnamed file objects.
+
+    Returns:
+    - str: The extracted text.
+
+    Raises:
+    - ExtractionError: The file could not be extracted; no partial text is
+      returned.
+    """
+    chunks = []
+    total = 0
+    text_iter = iter_text_from_file(file_path, ext=ext)
+    try:
+        for chunk in text_iter:
+            if max_chars is not None and total + len(chunk) >= max_chars:
+                chunks.append(chunk[:max_chars - total])
+                break
+            chunks.append(chunk)
+            total += len(chunk)
+    finally:
+        text_iter.close()
+    return "".join(chunks)
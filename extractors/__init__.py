@@ -0,0 +1,4 @@
+# Per-format text extractors. Each module exposes iter_text(source), a
+# generator of text chunks, where source is a path or a readable binary file
+# object, and is imported lazily by extraction_module the first time its
+# format is seen.
@@ -0,0 +1,50 @@
+import csv
+import io
+import itertools
+import os
+
+from extractors.tabular_extractor import TABULAR_SAMPLE_ROWS, format_summary, should_summarize
+from extractors.text_extractor import READ_CHARS, open_text
+
+
+def _byte_count(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if isinstance(source, io.BytesIO):
+        # In-memory download buffer; archive members stay unknown because
+        # seeking them means decompressing
+        return source.getbuffer().nbytes - source.tell()
+    return None
+
+
+def iter_text(source):
+    byte_count = _byte_count(source)
+    if should_summarize(byte_count=byte_count):
+        yield _summary(source, byte_count)
+        return
+
+    # CSV is already text the model can read; pass it through in blocks
+    # instead of parsing it into a DataFrame and serializing it again.
+    with open_text(source, newline='') as f:
+        while True:
+            block = f.read(READ_CHARS)
+            if not block:
+                break
+            yield block
+
+
+def _summary(source, byte_count):
+    # Only the header and the sample rows are parsed
+    with open_text(source, newline='') as f:
+        rows = list(itertools.islice(csv.reader(f), TABULAR_SAMPLE_ROWS + 1))
+    if not rows:
+        return ""
+    header, sample_rows = rows[0], rows[1:]
+    if byte_count is None:
+        size_text = "unknown rows"
+    else:
+        # Estimate the row count from the average size of the sampled rows
+        sample_bytes = sum(len(','.join(row).encode('utf-8')) + 1 for row in rows)
+        size_text = f"about {max(len(rows), byte_count * len(rows) // max(sample_bytes, 1)) - 1} rows"
+    name = os.path.basename(source) if isinstance(source, (str, os.PathLike)) else "CSV"
+    return format_summary(name, header, sample_rows, size_text)
@@ -0,0 +1,7 @@
+import docx
+
+
+def iter_text(source):
+    doc = docx.Document(source)
+    for index, para in enumerate(doc.paragraphs):
+        yield para.text if index == 0 else "\n" + para.text
@@ -0,0 +1,16 @@
+import os
+
+from ocr_module import ocr_images
+
+
+def iter_text(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            data = f.read()
+    else:
+        data = source.read()
+    # Shared reader, downscaled input and the image-hash cache
+    text = ocr_images([data])[0]
+    if isinstance(text, Exception):
+        raise text
+    yield text
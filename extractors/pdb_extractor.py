@@ -0,0 +1,11 @@
+from extractors.text_extractor import READ_CHARS, open_text
+
+
+# Helper function to extract text from .pdb files
+def iter_text(source):
+    with open_text(source) as f:
+        while True:
+            block = f.read(READ_CHARS)
+            if not block:
+                break
+            yield block
@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import PyPDF2
+
+from extraction_module import get_extract_pool, reset_extract_pool
+from metrics_module import get_metrics_registry
+
+# Processes that parse page ranges of large PDFs
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', max(1, min(4, (os.cpu_count() or 1)))))
+# Pages handed to a worker at a time; PDFs up to this size are parsed inline
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', 8))
+# Only the first PDF_MAX_PAGES pages are read (0 = all pages)
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 0))
+# OCR the embedded images of pages that have no text layer (scans)
+PDF_OCR_FALLBACK = os.getenv('PDF_OCR_FALLBACK', '1') != '0'
+
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def _get_page_pool():
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            # spawn: the dashboard process is multi-threaded, forking it is unsafe
+            _page_pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _page_pool
+
+
+def _reset_page_pool():
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=False)
+            _page_pool = None
+
+
+def _page_bounds(page_count):
+    """
+    Returns the (start, stop) page indexes to read: all pages, or the first
+    PDF_MAX_PAGES when that limit is set.
+    """
+    return 0, min(PDF_MAX_PAGES, page_count) if PDF_MAX_PAGES else page_count
+
+
+def _read_page(page):
+    """
+    Returns ('text', page_text) or, for a page without a text layer,
+    ('images', [encoded image bytes]) to be OCR'd.
+    """
+    page_text = page.extract_text()
+    if page_text and page_text.strip():
+        return 'text', page_text
+    if not PDF_OCR_FALLBACK:
+        return 'text', ''
+    try:
+        return 'images', [image.data for image in page.images]
+    except Exception:
+        # Unsupported image filters; nothing to OCR
+        return 'text', ''
+
+
+def _ocr_page(images):
+    # All images of the page go through the reader as one batch
+    from ocr_module import ocr_images
+    texts = ocr_images(images)
+    for text in texts:
+        if isinstance(text, Exception):
+            raise text
+    text = ' '.join(text for text in texts if text)
+    return text + "\n" if text else ""
+
+
+def _ocr_page_in_worker(images):
+    return _ocr_page(images), get_metrics_registry().drain()
+
+
+def _start_page(kind, content):
+    """
+    Returns the text of a page, or for a scanned page in the dashboard
+    process a future of its OCR (see _finish_page).
+    """
+    if kind == 'text':
+        return content + "\n" if content else ""
+    if not content:
+        return ""
+    if multiprocessing.parent_process() is not None:
+        # Already in an extract pool worker (e.g. a PDF inside a ZIP)
+        return _ocr_page(content)
+    # Scanned pages are recognized in the extract pool, the one process pool
+    # that loads OCR readers; page pool workers only parse
+    return get_extract_pool().submit(_ocr_page_in_worker, content)
+
+
+def _finish_page(page):
+    if not isinstance(page, Future):
+        return page
+    try:
+        text, worker_metrics = page.result()
+    except BrokenProcessPool:
+        reset_extract_pool()
+        raise
+    get_metrics_registry().merge(worker_metrics)
+    return text
+
+
+def _page_to_text(kind, content):
+    return _finish_page(_start_page(kind, content))
+
+
+def _read_page_range(file_path, start, stop):
+    # Runs in a page pool worker: every worker parses the file on its own and
+    # returns scanned pages as images for the caller to OCR
+    with open(file_path, 'rb') as f:
+        reader_pdf = PyPDF2.PdfReader(f)
+        pages = [_read_page(reader_pdf.pages[index]) for index in range(start, stop)]
+    return pages, get_metrics_registry().drain()
+
+
+def iter_text(source):
+    """
+    Yields the text of each page, in order (the first PDF_MAX_PAGES pages
+    when that limit is set; later pages are never parsed).
+
+    Parameters:
+    - source (str or file object): PDF path or readable binary file object.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            reader_pdf = PyPDF2.PdfReader(f)
+            start, stop = _page_bounds(len(reader_pdf.pages))
+            if PDF_WORKERS <= 1 or stop - start <= PDF_PAGES_PER_TASK:
+                yield from _iter_pages_inline(reader_pdf, start, stop)
+                return
+        yield from _iter_pages_parallel(source, start, stop)
+    else:
+        reader_pdf = PyPDF2.PdfReader(source)
+        start, stop = _page_bounds(len(reader_pdf.pages))
+        if (
+            PDF_WORKERS <= 1 or stop - start <= PDF_PAGES_PER_TASK
+            or multiprocessing.parent_process() is not None
+        ):
+            yield from _iter_pages_inline(reader_pdf, start, stop)
+            return
+        # Page workers open the file by path: give a large in-memory PDF a
+        # temp file for the duration of the parse
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as spilled:
+            source.seek(0)
+            shutil.copyfileobj(source, spilled)
+            spilled.flush()
+            yield from _iter_pages_parallel(spilled.name, start, stop)
+
+
+def _iter_pages_inline(reader_pdf, start, stop):
+    # One chunk per page; later pages are never parsed if the consumer stops
+    for index in range(start, stop):
+        page_text = _page_to_text(*_read_page(reader_pdf.pages[index]))
+        if page_text:
+            yield page_text
+
+
+def _iter_pages_parallel(file_path, start, stop):
+    """
+    Fans page ranges out to the process pool and yields pages in order. At
+    most PDF_WORKERS ranges are in flight, so stopping early leaves the rest
+    of the document unparsed. The scanned pages of a range are OCR'd
+    concurrently in the extract pool.
+    """
+    pool = _get_page_pool()
+    ranges = deque(
+        (range_start, min(range_start + PDF_PAGES_PER_TASK, stop))
+        for range_start in range(start, stop, PDF_PAGES_PER_TASK)
+    )
+    pending = deque()
+    pages = deque()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < PDF_WORKERS:
+                pending.append(pool.submit(_read_page_range, os.fspath(file_path), *ranges.popleft()))
+            try:
+                entries, worker_metrics = pending.popleft().result()
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); start a fresh pool next time
+                _reset_page_pool()
+                raise
+            get_metrics_registry().merge(worker_metrics)
+            pages.extend(_start_page(kind, content) for kind, content in entries)
+            while pages:
+                page_text = _finish_page(pages.popleft())
+                if page_text:
+                    yield page_text
+    finally:
+        for future in list(pending) + [page for page in pages if isinstance(page, Future)]:
+            future.cancel()
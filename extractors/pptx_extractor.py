@@ -0,0 +1,11 @@
+from pptx import Presentation
+
+
+def iter_text(source):
+    prs = Presentation(source)
+    first = True
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                yield shape.text if first else "\n" + shape.text
+                first = False
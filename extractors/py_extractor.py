@@ -0,0 +1,22 @@
+import os
+
+
+# Helper function to extract text from .py files
+def iter_text(source):
+    # Source files are small; reading them whole keeps the latin-1 fallback
+    # from emitting a partially decoded prefix first.
+    try:
+        if not isinstance(source, (str, os.PathLike)):
+            data = source.read()
+            try:
+                text = data.decode('utf-8')
+            except UnicodeDecodeError:
+                text = data.decode('latin-1')
+            # Same newline translation as opening the file in text mode
+            yield text.replace('\r\n', '\n').replace('\r', '\n')
+            return
+        with open(source, 'r', encoding='utf-8') as f:
+            yield f.read()
+    except UnicodeDecodeError:
+        with open(source, 'r', encoding='latin-1') as f:
+            yield f.read()
@@ -0,0 +1,88 @@
+# Shared settings and summary formatting for the CSV and XLSX extractors
+import csv
+import datetime
+import io
+import os
+
+# 'full' sends every row, 'summary' a schema plus sample rows, 'auto'
+# summarizes only tables above the size thresholds below
+TABULAR_MODE = os.getenv('TABULAR_MODE', 'full').lower()
+# Sheets with at least this many rows are summarized in 'auto' mode
+TABULAR_SUMMARY_MIN_ROWS = int(os.getenv('TABULAR_SUMMARY_MIN_ROWS', 5000))
+# CSV files of at least this many bytes are summarized in 'auto' mode
+TABULAR_SUMMARY_MIN_BYTES = int(os.getenv('TABULAR_SUMMARY_MIN_BYTES', 4 * 1024 * 1024))
+# Rows included in a summary
+TABULAR_SAMPLE_ROWS = int(os.getenv('TABULAR_SAMPLE_ROWS', 20))
+
+
+def should_summarize(row_count=None, byte_count=None):
+    """
+    Decides between full and summary output. Sizes that are unknown (None)
+    never trigger a summary in 'auto' mode.
+    """
+    if TABULAR_MODE == 'summary':
+        return True
+    if TABULAR_MODE != 'auto':
+        return False
+    return (
+        (row_count is not None and row_count >= TABULAR_SUMMARY_MIN_ROWS)
+        or (byte_count is not None and byte_count >= TABULAR_SUMMARY_MIN_BYTES)
+    )
+
+
+def _value_type(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+        return 'date'
+    try:
+        float(str(value).replace(',', ''))
+        return 'number'
+    except ValueError:
+        return 'text'
+
+
+def column_types(header, sample_rows):
+    """
+    Infers a type per column (number, date, boolean, text or mixed) from the
+    sample rows.
+    """
+    types = []
+    for index in range(len(header)):
+        seen = {_value_type(row[index]) for row in sample_rows if index < len(row)}
+        seen.discard(None)
+        types.append(seen.pop() if len(seen) == 1 else ('mixed' if seen else 'empty'))
+    return types
+
+
+def format_summary(title, header, sample_rows, size_text):
+    """
+    Renders the schema-plus-sample summary of one table.
+
+    Parameters:
+    - title (str): Sheet or file label.
+    - header (list): Column names (the first row).
+    - sample_rows (list of list): Rows after the header.
+    - size_text (str): Description of the table size, e.g. "12000 rows".
+
+    Returns:
+    - str: The summary text.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row in [header] + sample_rows:
+        writer.writerow(['' if value is None else value for value in row])
+    columns = ', '.join(
+        f"{'' if name is None else name} ({column_type})"
+        for name, column_type in zip(header, column_types(header, sample_rows))
+    )
+    return (
+        f"{title} ({size_text} x {len(header)} columns, summarized)\n"
+        f"Columns: {columns}\n"
+        f"First {len(sample_rows)} rows:\n"
+        f"{buffer.getvalue()}"
+    )
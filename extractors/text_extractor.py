@@ -0,0 +1,32 @@
+import io
+import os
+from contextlib import contextmanager
+
+# Characters read per chunk from plain-text files
+READ_CHARS = 64 * 1024
+
+
+@contextmanager
+def open_text(source, encoding='utf-8', newline=None):
+    """
+    Opens a path, or wraps a binary file object (e.g. a ZIP member), as a
+    text stream. A wrapped file object is left open for its owner.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding=encoding, newline=newline) as f:
+            yield f
+        return
+    wrapper = io.TextIOWrapper(source, encoding=encoding, newline=newline)
+    try:
+        yield wrapper
+    finally:
+        wrapper.detach()
+
+
+def iter_text(source):
+    with open_text(source) as f:
+        while True:
+            block = f.read(READ_CHARS)
+            if not block:
+                break
+            yield block
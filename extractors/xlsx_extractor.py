@@ -0,0 +1,48 @@
+import csv
+import io
+
+import openpyxl
+
+from extractors.tabular_extractor import TABULAR_SAMPLE_ROWS, format_summary, should_summarize
+
+# Rows serialized per yielded chunk
+ROWS_PER_CHUNK = 500
+
+
+def iter_text(source):
+    # read_only streams rows from the sheet XML instead of building the
+    # whole workbook in memory
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        for index, sheet in enumerate(workbook.worksheets):
+            title = f"Sheet: {sheet.title}"
+            # max_row comes from the sheet's stored dimensions (may be None)
+            if should_summarize(row_count=sheet.max_row):
+                yield ("" if index == 0 else "\n") + _summary(sheet, title)
+            else:
+                yield ("" if index == 0 else "\n") + title + "\n"
+                yield from _iter_rows(sheet)
+    finally:
+        workbook.close()
+
+
+def _iter_rows(sheet):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row_number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+        writer.writerow(['' if value is None else value for value in row])
+        if row_number % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _summary(sheet, title):
+    # Stops parsing the sheet XML after the sample rows
+    rows = [list(row) for row in sheet.iter_rows(max_row=TABULAR_SAMPLE_ROWS + 1, values_only=True)]
+    if not rows:
+        return f"{title} (empty)\n"
+    size_text = "unknown rows" if sheet.max_row is None else f"{sheet.max_row - 1} rows"
+    return format_summary(title, rows[0], rows[1:], size_text)
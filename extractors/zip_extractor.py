@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from extraction_module import SUPPORTED_EXTENSIONS, ExtractionError, iter_text_from_file
+from ocr_module import IMAGE_EXTENSIONS, OCR_BATCH_SIZE, ocr_images
+
+# Cap on the decompressed bytes read from one archive, nested archives included
+ZIP_MAX_TOTAL_BYTES = int(os.getenv('ZIP_MAX_TOTAL_BYTES', 512 * 1024 * 1024))
+# Archives nested deeper than this are skipped (the outer archive is depth 1)
+ZIP_MAX_DEPTH = int(os.getenv('ZIP_MAX_DEPTH', 3))
+# Members extracted concurrently
+ZIP_WORKERS = int(os.getenv('ZIP_WORKERS', min(4, os.cpu_count() or 1)))
+# Members that need random access are buffered in memory up to this size,
+# then spilled to a temporary file
+ZIP_SPOOL_BYTES = int(os.getenv('ZIP_SPOOL_BYTES', 16 * 1024 * 1024))
+
+# Formats whose extractors read their input front to back; these are fed the
+# decompressing member stream directly
+STREAMING_EXTENSIONS = {'.txt', '.json', '.csv', '.py', '.pdb'}
+
+
+class _ByteBudget:
+    """Decompressed bytes still allowed for one top-level archive"""
+
+    def __init__(self, limit):
+        self.remaining = limit
+        self._lock = threading.Lock()
+
+    def reserve(self, size):
+        with self._lock:
+            if size > self.remaining:
+                return False
+            self.remaining -= size
+            return True
+
+
+def iter_text(source):
+    with zipfile.ZipFile(source, 'r') as zip_ref:
+        yield from _iter_archive(zip_ref, 1, _ByteBudget(ZIP_MAX_TOTAL_BYTES))
+
+
+def _iter_archive(zip_ref, depth, budget):
+    """
+    Yields the text of every supported member, in archive order. Members are
+    read straight from the archive; unsupported ones are never decompressed.
+    Image members are OCR'd in batches as the loop reaches them.
+    """
+    members = [info for info in zip_ref.infolist() if not info.is_dir()]
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=ZIP_WORKERS) as pool:
+        try:
+            for job in _member_jobs(members):
+                # Keep at most ZIP_WORKERS jobs in flight so that memory
+                # stays bounded and an early stop leaves the rest unread
+                if len(pending) >= ZIP_WORKERS:
+                    yield pending.popleft().result()
+                if isinstance(job, list):
+                    pending.append(pool.submit(_images_text, zip_ref, job, budget))
+                else:
+                    pending.append(pool.submit(_member_text, zip_ref, job, depth, budget))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _member_jobs(members):
+    """
+    Splits the members into jobs, in archive order: runs of up to
+    OCR_BATCH_SIZE consecutive images (a list, one OCR batch) or single
+    members.
+    """
+    images = []
+    for info in members:
+        if os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS:
+            images.append(info)
+            if len(images) == OCR_BATCH_SIZE:
+                yield images
+                images = []
+            continue
+        if images:
+            yield images
+            images = []
+        yield info
+    if images:
+        yield images
+
+
+def _images_text(zip_ref, infos, budget):
+    """
+    Recognizes a run of image members as one OCR batch instead of one reader
+    call per member.
+    """
+    outputs = [""] * len(infos)
+    positions, images = [], []
+    for position, info in enumerate(infos):
+        name = info.filename
+        if not budget.reserve(info.file_size):
+            outputs[position] = f"Skipped {name}: archive exceeds the {ZIP_MAX_TOTAL_BYTES} byte extraction limit\n"
+            continue
+        try:
+            images.append(zip_ref.read(info))
+        except Exception as e:
+            raise ExtractionError(f"Error processing {name}: {e}") from e
+        positions.append(position)
+    if images:
+        for position, text in zip(positions, ocr_images(images)):
+            name = infos[position].filename
+            if isinstance(text, Exception):
+                raise ExtractionError(f"Error processing {name}: {text}")
+            outputs[position] = f"Extracted from {name}:\n{text}\n"
+    return "".join(outputs)
+
+
+def _member_text(zip_ref, info, depth, budget):
+    name = info.filename
+    _, ext = os.path.splitext(name)
+    ext = ext.lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        return f"Skipped unsupported file: {name}\n"
+    if ext == '.zip' and depth >= ZIP_MAX_DEPTH:
+        return f"Skipped nested archive {name}: depth limit of {ZIP_MAX_DEPTH} reached\n"
+    # file_size bounds what zipfile will decompress for the member
+    if not budget.reserve(info.file_size):
+        return f"Skipped {name}: archive exceeds the {ZIP_MAX_TOTAL_BYTES} byte extraction limit\n"
+
+    parts = [f"Extracted from {name}:\n"]
+    try:
+        with zip_ref.open(info) as member:
+            if ext in STREAMING_EXTENSIONS:
+                parts.extend(iter_text_from_file(member, ext=ext))
+            else:
+                # PDF, Office and nested ZIP readers seek around the file
+                with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_BYTES) as buffer:
+                    shutil.copyfileobj(member, buffer)
+                    buffer.seek(0)
+                    if ext == '.zip':
+                        with zipfile.ZipFile(buffer, 'r') as nested:
+                            parts.extend(_iter_archive(nested, depth + 1, budget))
+                    else:
+                        parts.extend(iter_text_from_file(buffer, ext=ext))
+    except Exception as e:
+        # A member that fails fails the archive, so partial text is never cached
+        raise ExtractionError(f"Error processing {name}: {e}") from e
+    parts.append("\n")
+    return "".join(parts)
@@ -0,0 +1,46 @@
+# feedback_module.py
+import re
+from collections import Counter
+
+# Words ignored when counting feedback themes
+STOPWORDS = frozenset([
+    'the', 'and', 'is', 'in', 'it', 'of', 'to', 'a', 'for', 'on',
+    'with', 'as', 'this', 'that', 'but', 'be', 'have', 'are', 'was',
+    'were', 'or', 'an', 'at', 'by', 'from', 'not', 'your', 'you'
+])
+
+# Longest term stored in the index (matches the FeedbackTerms.term column)
+MAX_TERM_LENGTH = 200
+
+_WORD_PATTERN = re.compile(r'\b\w+\b')
+
+
+def tokenize_feedback(text):
+    """
+    Splits feedback into lowercase words, dropping stopwords.
+
+    Parameters:
+    - text (str): Feedback text.
+
+    Returns:
+    - list of str: The remaining words, in order.
+    """
+    if not text:
+        return []
+    return [
+        word for word in _WORD_PATTERN.findall(text.lower())
+        if word not in STOPWORDS and len(word) <= MAX_TERM_LENGTH
+    ]
+
+
+def count_feedback_terms(text):
+    """
+    Counts the terms and bigrams (adjacent words after stopword removal) of
+    one piece of feedback.
+
+    Returns:
+    - tuple: (Counter of terms, Counter of bigrams)
+    """
+    words = tokenize_feedback(text)
+    bigrams = (f"{first} {second}" for first, second in zip(words, words[1:]))
+    return Counter(words), Counter(bigram for bigram in bigrams if len(bigram) <= MAX_TERM_LENGTH)
@@ -0,0 +1,322 @@
+# metrics_module.py
+import bisect
+import functools
+import http.server
+import inspect
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Set METRICS_ENABLED=0 to turn every span into a no-op
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+# Prefix of the exported metric names
+METRIC_PREFIX = 'gaia_stage'
+
+
+class Histogram:
+    """
+    Cumulative latency histogram of one stage: bucket counts, sum and count.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if error:
+            self.errors += 1
+
+    def merge(self, other):
+        for index, value in enumerate(other['counts']):
+            self.counts[index] += value
+        self.total += other['sum']
+        self.count += other['count']
+        self.errors += other['errors']
+
+    def to_dict(self):
+        return {'counts': list(self.counts), 'sum': self.total, 'count': self.count, 'errors': self.errors}
+
+    def quantile(self, q):
+        """
+        Estimates a quantile by linear interpolation inside its bucket.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Process-wide, thread-safe collection of per-stage latency histograms.
+
+    Recording a span is a perf_counter difference, a bisect and a short
+    locked update, so it is cheap enough to stay on in production.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, error=False):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds, error)
+
+    def snapshot(self):
+        """
+        Returns a copy of all histograms: stage -> Histogram.
+        """
+        with self._lock:
+            copies = {}
+            for stage, histogram in self._histograms.items():
+                copy = Histogram(self.buckets)
+                copy.merge(histogram.to_dict())
+                copies[stage] = copy
+            return copies
+
+    def drain(self):
+        """
+        Returns all histograms as plain dicts and resets them. Used to ship
+        spans recorded in a pool worker back to the parent process.
+        """
+        with self._lock:
+            drained = {stage: histogram.to_dict() for stage, histogram in self._histograms.items()}
+            self._histograms = {}
+            return drained
+
+    def merge(self, drained):
+        """
+        Adds histograms returned by drain() in another process.
+        """
+        if not drained:
+            return
+        with self._lock:
+            for stage, data in drained.items():
+                histogram = self._histograms.get(stage)
+                if histogram is None:
+                    histogram = self._histograms[stage] = Histogram(self.buckets)
+                histogram.merge(data)
+
+    def summary(self):
+        """
+        Returns one row per stage for display: count, errors, total, mean,
+        p50 and p95 (seconds), slowest total first.
+        """
+        rows = []
+        for stage, histogram in self.snapshot().items():
+            rows.append({
+                'stage': stage,
+                'count': histogram.count,
+                'errors': histogram.errors,
+                'total_seconds': histogram.total,
+                'mean_seconds': histogram.total / histogram.count if histogram.count else None,
+                'p50_seconds': histogram.quantile(0.50),
+                'p95_seconds': histogram.quantile(0.95)
+            })
+        rows.sort(key=lambda row: row['total_seconds'], reverse=True)
+        return rows
+
+    def render_prometheus(self):
+        """
+        Renders the histograms in the Prometheus text exposition format.
+        """
+        name = f"{METRIC_PREFIX}_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent per pipeline stage.",
+            f"# TYPE {name} histogram"
+        ]
+        snapshot = self.snapshot()
+        for stage in sorted(snapshot):
+            histogram = snapshot[stage]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), histogram.counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        errors_name = f"{METRIC_PREFIX}_errors_total"
+        lines.append(f"# HELP {errors_name} Spans of a stage that ended with an exception.")
+        lines.append(f"# TYPE {errors_name} counter")
+        for stage in sorted(snapshot):
+            lines.append(f'{errors_name}{{stage="{stage}"}} {snapshot[stage].errors}')
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry():
+    """
+    Returns the process-wide metrics registry.
+    """
+    return _registry
+
+
+@contextmanager
+def span(stage):
+    """
+    Times the with block and records it under stage; an exception is counted
+    as an error and re-raised.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        _registry.observe(stage, time.perf_counter() - start, error)
+
+
+def timed(stage):
+    """
+    Decorator recording every call of a function (sync or async) as a span.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_iter(stage, iterator):
+    """
+    Yields from iterator and records the time spent producing items (not the
+    time the consumer holds them) as one span when it finishes or is closed.
+    """
+    if not METRICS_ENABLED:
+        yield from iterator
+        return
+    elapsed = 0.0
+    error = False
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                return
+            except BaseException:
+                elapsed += time.perf_counter() - start
+                error = True
+                raise
+            elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+        _registry.observe(stage, elapsed, error)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = _registry.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def write_metrics_file(path):
+    """
+    Writes the Prometheus text to path atomically (for the node_exporter
+    textfile collector or for inspection).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(_registry.render_prometheus())
+    os.replace(tmp_path, path)
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters(port=None, file_path=None, file_interval=None):
+    """
+    Starts the configured exporters once per process: an HTTP /metrics
+    endpoint (METRICS_PORT) and/or a file rewritten every METRICS_FILE_INTERVAL
+    seconds (METRICS_FILE). Does nothing when neither is configured.
+    """
+    global _exporters_started
+    port = port if port is not None else os.getenv('METRICS_PORT')
+    file_path = file_path or os.getenv('METRICS_FILE')
+    file_interval = file_interval or float(os.getenv('METRICS_FILE_INTERVAL', 15))
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        if port:
+            try:
+                server = http.server.ThreadingHTTPServer(('0.0.0.0', int(port)), _MetricsHandler)
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            except OSError as e:
+                print(f"Error starting metrics endpoint on port {port}: {e}")
+        if file_path:
+            threading.Thread(
+                target=_write_forever, args=(file_path, file_interval), name="metrics-file", daemon=True
+            ).start()
+
+
+def _write_forever(path, interval):
+    while True:
+        try:
+            write_metrics_file(path)
+        except OSError as e:
+            print(f"Error writing metrics file {path}: {e}")
+        time.sleep(interval)
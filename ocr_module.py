@@ -0,0 +1,152 @@
+# ocr_module.py
+import hashlib
+import io
+import os
+from dotenv import load_dotenv
+
+from cache_module import get_ocr_cache
+from extraction_module import ExtractionError
+from metrics_module import span
+from resource_module import get_ocr_reader
+
+# Load environment variables
+load_dotenv()
+
+# Attachment types recognized with OCR
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+
+# Images are downscaled to this resolution before recognition; text at 150
+# DPI is still legible to the model and far cheaper to detect
+OCR_TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', 150))
+# Longest side in pixels after scaling, for images without DPI information
+OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', 1600))
+# Images sent through the reader together
+OCR_BATCH_SIZE = int(os.getenv('OCR_BATCH_SIZE', 8))
+
+# Part of the cache key; bump when preprocessing or recognition changes
+OCR_VERSION = "1"
+
+
+def _cache_key(data):
+    settings = f"{OCR_VERSION}:{OCR_TARGET_DPI}:{OCR_MAX_SIDE}".encode('utf-8')
+    return hashlib.sha256(settings + b"\0" + data).hexdigest()
+
+
+def prepare_image(data):
+    """
+    Decodes an encoded image and downscales it to OCR_TARGET_DPI (or to
+    OCR_MAX_SIDE pixels when the image carries no DPI).
+
+    Parameters:
+    - data (bytes): Encoded image (PNG, JPEG, ...).
+
+    Returns:
+    - numpy.ndarray: RGB pixels, shape (height, width, 3).
+    """
+    import numpy as np
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image = image.convert('RGB')
+    scale = 1.0
+    dpi = image.info.get('dpi')
+    if dpi and dpi[0] and dpi[0] > OCR_TARGET_DPI:
+        scale = OCR_TARGET_DPI / float(dpi[0])
+    longest = max(image.size) * scale
+    if longest > OCR_MAX_SIDE:
+        scale *= OCR_MAX_SIDE / longest
+    if scale < 1.0:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    return np.asarray(image)
+
+
+def _pad_to(pixels, height, width):
+    import numpy as np
+
+    # White padding: an empty margin adds no text for the detector to find
+    padded = np.full((height, width, 3), 255, dtype=pixels.dtype)
+    padded[:pixels.shape[0], :pixels.shape[1]] = pixels
+    return padded
+
+
+def _recognize_batch(reader, batch):
+    """
+    Runs one batch of prepared images through the reader. readtext_batched
+    needs equally sized inputs, so images are padded to the batch maximum.
+    """
+    if len(batch) == 1:
+        return [' '.join(reader.readtext(batch[0], detail=0))]
+    height = max(pixels.shape[0] for pixels in batch)
+    width = max(pixels.shape[1] for pixels in batch)
+    results = reader.readtext_batched(
+        [_pad_to(pixels, height, width) for pixels in batch],
+        batch_size=len(batch),
+        detail=0
+    )
+    return [' '.join(result) for result in results]
+
+
+def ocr_images(images):
+    """
+    Recognizes the text of several images with the shared reader.
+
+    Cached results are reused by image hash; the remaining images are
+    downscaled, grouped by size and recognized in batches of OCR_BATCH_SIZE.
+
+    Parameters:
+    - images (list of bytes): Encoded images.
+
+    Returns:
+    - list: Text per image (str), in input order. Images that cannot be
+      processed get an ExtractionError instead, which is never cached.
+    """
+    ocr_cache = get_ocr_cache()
+    texts = [None] * len(images)
+    keys = [_cache_key(data) for data in images]
+
+    # Identical images in one call are recognized once
+    pending = {}
+    for index, key in enumerate(keys):
+        cached_text = ocr_cache.get(key)
+        if cached_text is not None:
+            texts[index] = cached_text
+        else:
+            pending.setdefault(key, []).append(index)
+    if not pending:
+        return texts
+
+    prepared = []
+    for key, indexes in pending.items():
+        try:
+            with span('ocr.prepare'):
+                prepared.append((key, prepare_image(images[indexes[0]])))
+        except Exception as e:
+            for index in indexes:
+                texts[index] = ExtractionError(f"Error processing image file: {e}")
+
+    # Similar sizes share a batch so that padding stays small
+    prepared.sort(key=lambda item: item[1].shape[0] * item[1].shape[1])
+    reader = get_ocr_reader()
+    for start in range(0, len(prepared), OCR_BATCH_SIZE):
+        batch = prepared[start:start + OCR_BATCH_SIZE]
+        try:
+            with span('ocr.batch'):
+                results = _recognize_batch(reader, [pixels for _, pixels in batch])
+        except Exception:
+            # Isolate the failing image by retrying one at a time
+            results = []
+            for _, pixels in batch:
+                try:
+                    results.append(_recognize_batch(reader, [pixels])[0])
+                except Exception as e:
+                    results.append(e)
+        for (key, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                text = ExtractionError(f"Error processing image file: {result}")
+            else:
+                text = result
+                ocr_cache.put(key, text)
+            for index in pending[key]:
+                texts[index] = text
+    return texts
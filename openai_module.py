@@ -1,31 +1,409 @@
-# openai_module.py
 import openai
+import asyncio
 import os
+import random
+import threading
+import time
+import weakref
 from dotenv import load_dotenv
 
+from cache_module import get_response_cache
+from metrics_module import METRICS_ENABLED, get_metrics_registry, span, timed, timed_iter
+
 # 加載 .env 文件中的環境變數
 load_dotenv()
 
-def send_to_openai(prompt):
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+SYSTEM_PROMPT = "You are a helpful AI assistant. Please answer the questions based on the content of the provided files, and respond in English."
+MAX_TOKENS = 1500  # 根據需要調整
+TEMPERATURE = 0.7
+
+# Account limits used for client-side scheduling (requests / tokens per minute)
+DEFAULT_RPM = int(os.getenv("OPENAI_RPM", 500))
+DEFAULT_TPM = int(os.getenv("OPENAI_TPM", 30000))
+DEFAULT_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 5))
+DEFAULT_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 120))
+
+# Backoff between retries: BACKOFF_BASE * 2**attempt seconds plus jitter
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+class OpenAIRequestError(Exception):
+    """Raised when a chat completion request fails for good."""
+
+    def __init__(self, message, status_code=None, attempts=1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.attempts = attempts
+
+
+class OpenAIRateLimitError(OpenAIRequestError):
+    """429 responses that persisted through all retries."""
+
+
+class OpenAIServerError(OpenAIRequestError):
+    """5xx responses, timeouts and connection failures that persisted through all retries."""
+
+
+class OpenAIClientError(OpenAIRequestError):
+    """Non-retryable request errors (authentication, invalid request, ...)."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at capacity per minute.
+
+    reserve() never blocks: it takes the tokens (allowing the balance to go
+    negative) and returns how long the caller has to wait before the
+    reservation is covered. This keeps the sync and async paths identical.
+    """
+
+    def __init__(self, capacity_per_minute):
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        with self._lock:
+            self._refill()
+            # A single request larger than the bucket must still go through
+            amount = min(amount, self.capacity)
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """Combines a requests-per-minute and a tokens-per-minute bucket."""
+
+    def __init__(self, requests_per_minute=DEFAULT_RPM, tokens_per_minute=DEFAULT_TPM):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def reserve(self, tokens):
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def acquire(self, tokens):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def estimate_tokens(*texts, completion_tokens=0):
+    """
+    Rough token estimate (about 4 characters per token) used for scheduling.
+    """
+    return sum(len(text or "") for text in texts) // 4 + completion_tokens
+
+
+def _retry_after(exc):
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return None
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",  # 修正模型名稱
-            messages=[
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _classify_error(exc, attempts):
+    """
+    Maps an openai exception to (typed error, retryable).
+    """
+    if isinstance(exc, openai.RateLimitError):
+        return OpenAIRateLimitError(str(exc), status_code=429, attempts=attempts), True
+    if isinstance(exc, openai.APIConnectionError):
+        # Includes APITimeoutError
+        return OpenAIServerError(str(exc), attempts=attempts), True
+    if isinstance(exc, openai.APIStatusError):
+        if exc.status_code >= 500:
+            return OpenAIServerError(str(exc), status_code=exc.status_code, attempts=attempts), True
+        return OpenAIClientError(str(exc), status_code=exc.status_code, attempts=attempts), False
+    return OpenAIRequestError(str(exc), attempts=attempts), False
+
+
+def _backoff_delay(attempt, exc):
+    retry_after = _retry_after(exc)
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+
+class OpenAIClient:
+    """
+    Reusable chat completion client with connection reuse, client-side rate
+    limiting and retries with exponential backoff on 429/5xx.
+
+    The underlying openai clients keep their HTTP connection pools for the
+    lifetime of this object. Async clients are created per event loop because
+    an httpx AsyncClient cannot be shared between loops.
+    """
+
+    def __init__(self, model=DEFAULT_MODEL, max_retries=DEFAULT_MAX_RETRIES,
+                 requests_per_minute=DEFAULT_RPM, tokens_per_minute=DEFAULT_TPM,
+                 timeout=DEFAULT_TIMEOUT):
+        self.model = model
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                # Retries are handled here so they go through the rate limiter
+                self._client = openai.OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, timeout=self.timeout
+                )
+            return self._client
+
+    def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = openai.AsyncOpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, timeout=self.timeout
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def _request_kwargs(self, prompt, system_prompt, max_tokens, temperature):
+        return {
+            'model': self.model,
+            'messages': [
                 {
                     "role": "system",
-                    "content": "You are a helpful AI assistant. Please answer the questions based on the content of the provided files, and respond in English."
+                    "content": system_prompt
                 },
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            max_tokens=1500,  # 根據需要調整
-            temperature=0.7,
-        )
-        advice = response.choices[0].message.content  # 正確訪問訊息內容
-        return advice
-    except Exception as e:
-        return f"與 OpenAI 通信時發生錯誤: {e}"
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+        }
+
+    def _settle_tokens(self, response, reserved):
+        # Give back the part of the reservation the request did not use
+        usage = getattr(response, 'usage', None)
+        if usage is not None and usage.total_tokens < reserved:
+            self.rate_limiter.tokens.refund(reserved - usage.total_tokens)
+
+    def _cache_key(self, prompt, system_prompt, max_tokens, temperature):
+        return get_response_cache().make_key(self.model, temperature, max_tokens, system_prompt, prompt)
+
+    def complete(self, prompt, system_prompt=SYSTEM_PROMPT, max_tokens=MAX_TOKENS, temperature=TEMPERATURE,
+                 use_cache=True):
+        """
+        Sends a chat completion request and returns the response text.
+
+        Identical requests are answered from the response cache unless
+        use_cache is False (e.g. to deliberately re-sample); the fresh answer
+        then replaces the cached one.
+
+        Raises:
+        - OpenAIRequestError (or a subclass) once retries are exhausted.
+        """
+        cache_key = self._cache_key(prompt, system_prompt, max_tokens, temperature)
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                return cached
+
+        kwargs = self._request_kwargs(prompt, system_prompt, max_tokens, temperature)
+        reserved = estimate_tokens(system_prompt, prompt, completion_tokens=max_tokens)
+        for attempt in range(self.max_retries + 1):
+            with span('openai.rate_limit_wait'):
+                self.rate_limiter.acquire(reserved)
+            try:
+                with span('openai.request'):
+                    response = self._get_client().chat.completions.create(**kwargs)
+            except Exception as e:
+                # A failed request reports no usage; give its tokens back
+                self.rate_limiter.tokens.refund(reserved)
+                error, retryable = _classify_error(e, attempt + 1)
+                if not retryable or attempt == self.max_retries:
+                    raise error from e
+                time.sleep(_backoff_delay(attempt, e))
+                continue
+            self._settle_tokens(response, reserved)
+            content = response.choices[0].message.content
+            if content is not None:
+                get_response_cache().put(cache_key, content)
+            return content
+
+    async def acomplete(self, prompt, system_prompt=SYSTEM_PROMPT, max_tokens=MAX_TOKENS, temperature=TEMPERATURE,
+                        use_cache=True):
+        """
+        Async variant of complete().
+        """
+        cache_key = self._cache_key(prompt, system_prompt, max_tokens, temperature)
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                return cached
+
+        kwargs = self._request_kwargs(prompt, system_prompt, max_tokens, temperature)
+        reserved = estimate_tokens(system_prompt, prompt, completion_tokens=max_tokens)
+        for attempt in range(self.max_retries + 1):
+            with span('openai.rate_limit_wait'):
+                await self.rate_limiter.acquire_async(reserved)
+            try:
+                with span('openai.request'):
+                    response = await self._get_async_client().chat.completions.create(**kwargs)
+            except Exception as e:
+                # A failed request reports no usage; give its tokens back
+                self.rate_limiter.tokens.refund(reserved)
+                error, retryable = _classify_error(e, attempt + 1)
+                if not retryable or attempt == self.max_retries:
+                    raise error from e
+                await asyncio.sleep(_backoff_delay(attempt, e))
+                continue
+            self._settle_tokens(response, reserved)
+            content = response.choices[0].message.content
+            if content is not None:
+                get_response_cache().put(cache_key, content)
+            return content
+
+    def stream(self, prompt, system_prompt=SYSTEM_PROMPT, max_tokens=MAX_TOKENS, temperature=TEMPERATURE,
+               use_cache=True):
+        """
+        Streaming variant of complete(): yields the response text in pieces as
+        they arrive. A cached answer is yielded as a single piece.
+
+        Failures are retried only until the first piece is yielded; after that
+        the error is raised, since the caller has already shown part of the
+        answer. The full text goes to the response cache only when the stream
+        completes.
+
+        Raises:
+        - OpenAIRequestError (or a subclass) once retries are exhausted or
+          the stream breaks off.
+        """
+        cache_key = self._cache_key(prompt, system_prompt, max_tokens, temperature)
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        kwargs = self._request_kwargs(prompt, system_prompt, max_tokens, temperature)
+        # The last chunk then carries the token usage of the whole response
+        kwargs.update(stream=True, stream_options={'include_usage': True})
+        reserved = estimate_tokens(system_prompt, prompt, completion_tokens=max_tokens)
+        for attempt in range(self.max_retries + 1):
+            with span('openai.rate_limit_wait'):
+                self.rate_limiter.acquire(reserved)
+            start = time.perf_counter()
+            pieces = []
+            usage_chunk = None
+            try:
+                with span('openai.request'):
+                    response = self._get_client().chat.completions.create(**kwargs)
+                with response:
+                    for chunk in timed_iter('openai.stream', iter(response)):
+                        if getattr(chunk, 'usage', None) is not None:
+                            usage_chunk = chunk
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if not delta:
+                            continue
+                        if not pieces and METRICS_ENABLED:
+                            get_metrics_registry().observe('openai.first_token', time.perf_counter() - start)
+                        pieces.append(delta)
+                        yield delta
+            except Exception as e:
+                if not pieces:
+                    # Nothing was generated; give the tokens back. A stream
+                    # that broke off keeps its reservation, since its usage
+                    # is unknown.
+                    self.rate_limiter.tokens.refund(reserved)
+                error, retryable = _classify_error(e, attempt + 1)
+                if pieces or not retryable or attempt == self.max_retries:
+                    raise error from e
+                time.sleep(_backoff_delay(attempt, e))
+                continue
+            if usage_chunk is not None:
+                self._settle_tokens(usage_chunk, reserved)
+            if pieces:
+                get_response_cache().put(cache_key, ''.join(pieces))
+            return
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """
+    Returns the process-wide OpenAIClient so all callers share one connection
+    pool and one rate limiter.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAIClient()
+        return _client
+
+
+@timed('openai.send')
+def send_to_openai(prompt, use_cache=True):
+    """
+    Sends a prompt to OpenAI and returns the response text.
+
+    Parameters:
+    - prompt (str): The user prompt.
+    - use_cache (bool): Set to False to bypass the response cache and re-sample.
+
+    Raises:
+    - OpenAIRequestError (or a subclass) if the request fails after retries.
+    """
+    return get_openai_client().complete(prompt, use_cache=use_cache)
+
+
+@timed('openai.send')
+async def async_send_to_openai(prompt, use_cache=True):
+    """
+    Async variant of send_to_openai().
+    """
+    return await get_openai_client().acomplete(prompt, use_cache=use_cache)
+
+
+def stream_from_openai(prompt, use_cache=True):
+    """
+    Sends a prompt to OpenAI and yields the response text as it arrives, for
+    incremental rendering (e.g. with st.write_stream).
+
+    Parameters:
+    - prompt (str): The user prompt.
+    - use_cache (bool): Set to False to bypass the response cache and re-sample.
+
+    Raises:
+    - OpenAIRequestError (or a subclass) if the request fails after retries.
+    """
+    return get_openai_client().stream(prompt, use_cache=use_cache)
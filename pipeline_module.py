@@ -0,0 +1,244 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+
+from artifact_module import get_extraction_artifact
+from aws_module import download_to_buffer
+from cache_module import get_extraction_cache
+from metrics_module import get_metrics_registry
+from extraction_module import (
+    SUPPORTED_EXTENSIONS, configure_extract_pool, extract_text_from_file, extraction_settings_key, get_extract_pool,
+    reset_extract_pool
+)
+from ocr_module import IMAGE_EXTENSIONS
+
+# Load environment variables
+load_dotenv()
+
+# Formats whose extraction is CPU bound (OCR, nested archives); they run on
+# the extract process pool, everything else on the download threads. PDFs stay
+# on the threads because pdf_extractor fans their pages out to its own process
+# pool and sends scanned pages to the extract pool for OCR.
+# The images of a task are collected and recognized as one OCR batch.
+PROCESS_POOL_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.zip'}
+
+_download_workers = int(os.getenv('DOWNLOAD_WORKERS', 8))
+
+_download_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure_pools(download_workers=None, extract_workers=None):
+    """
+    Sets the pool sizes. Pools that already exist are recreated on next use.
+
+    Parameters:
+    - download_workers (int, optional): Threads used for S3 downloads.
+    - extract_workers (int, optional): Processes used for CPU-heavy extraction.
+    """
+    global _download_workers, _download_pool
+    with _pool_lock:
+        if download_workers is not None and download_workers != _download_workers:
+            _download_workers = download_workers
+            if _download_pool is not None:
+                _download_pool.shutdown(wait=False)
+                _download_pool = None
+    if extract_workers is not None:
+        configure_extract_pool(extract_workers)
+
+
+def _get_download_pool():
+    global _download_pool
+    with _pool_lock:
+        if _download_pool is None:
+            _download_pool = ThreadPoolExecutor(max_workers=_download_workers, thread_name_prefix="s3-download")
+        return _download_pool
+
+
+def _download_and_extract(s3_client, bucket_name, file_key, file_ext, size, etag, max_chars, use_artifacts):
+    """
+    Returns the precomputed artifact of one object if there is one; otherwise
+    downloads the object into a DownloadBuffer and, for light formats,
+    extracts it on this thread. Returns (text, None) or (None, buffer) when
+    the extraction still has to run on the process pool; the caller then owns
+    the buffer and must close it.
+    """
+    if use_artifacts:
+        text = get_extraction_artifact(s3_client, bucket_name, file_key, etag)
+        if text is not None:
+            return (text[:max_chars] if max_chars is not None else text), None
+
+    buffer = download_to_buffer(s3_client, bucket_name, file_key, size=size, suffix=file_ext)
+    if file_ext in PROCESS_POOL_EXTENSIONS:
+        return None, buffer
+
+    with buffer:
+        # A spilled file is read by path so large PDFs keep their page pool
+        source = buffer.path or buffer.file
+        return extract_text_from_file(source, max_chars=max_chars, ext=file_ext), None
+
+
+def _worker_source(buffer):
+    # Pool workers get the bytes of an in-memory buffer or the path of a
+    # spilled one; the parent keeps the buffer open until the job is done
+    return buffer.path or buffer.getvalue()
+
+
+# Pool workers return their spans with the result so the parent process
+# reports them too
+def _extract_in_worker(source, file_ext, max_chars):
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    text = extract_text_from_file(source, max_chars=max_chars, ext=file_ext)
+    return text, get_metrics_registry().drain()
+
+
+def _ocr_in_worker(sources, max_chars):
+    from ocr_module import ocr_images
+    images = []
+    for source in sources:
+        if isinstance(source, bytes):
+            images.append(source)
+        else:
+            with open(source, 'rb') as f:
+                images.append(f.read())
+    # Failed images come back as ExtractionError instances
+    texts = [
+        text[:max_chars] if max_chars is not None and isinstance(text, str) else text
+        for text in ocr_images(images)
+    ]
+    return texts, get_metrics_registry().drain()
+
+
+def process_task_files(s3_client, bucket_name, files_info, max_chars=None, use_artifacts=True):
+    """
+    Downloads and extracts all files of a task concurrently.
+
+    Cached text is used without touching S3, then text precomputed by
+    preextract_to_s3.py is read from its artifact; only files without an
+    up-to-date artifact are extracted live. Downloads run on a thread pool
+    into memory buffers (spilling to an auto-deleted temp file above
+    DOWNLOAD_SPOOL_BYTES); as each one completes, CPU-heavy formats are
+    handed to a process pool so parsing overlaps with the remaining transfers.
+
+    Parameters:
+    - s3_client: A boto3 S3 client.
+    - bucket_name (str): The bucket holding the files.
+    - files_info (list of dict): Entries with 'file_name', 'file_ext', 'etag'
+      and optionally 'size'.
+    - max_chars (int, optional): Per-file cap on extracted characters.
+    - use_artifacts (bool): Set to False to ignore the precomputed artifacts.
+
+    Returns:
+    - list of dict: One entry per input file, in input order, with
+      'file_name', 'text' (str or None), 'error' (str or None) and
+      'skipped' (bool, True for unsupported types).
+    """
+    extraction_cache = get_extraction_cache()
+    results = [
+        {'file_name': file_info['file_name'], 'text': None, 'error': None, 'skipped': False}
+        for file_info in files_info
+    ]
+    cache_keys = {}
+    download_futures = {}
+    settings_key = extraction_settings_key()
+
+    download_pool = _get_download_pool()
+    for index, file_info in enumerate(files_info):
+        file_key = file_info['file_name']  # The key in S3 is the file name
+        file_ext = file_info['file_ext']
+        if file_ext not in SUPPORTED_EXTENSIONS:
+            results[index]['skipped'] = True
+            continue
+
+        # Reuse previously extracted text for this exact object version,
+        # extractor version and output settings
+        cache_key = extraction_cache.make_key(
+            bucket_name, file_key, file_info.get('etag'), f"{settings_key}:{max_chars}"
+        )
+        cached_text = extraction_cache.get(cache_key)
+        if cached_text is not None:
+            results[index]['text'] = cached_text
+            continue
+
+        cache_keys[index] = cache_key
+        future = download_pool.submit(
+            _download_and_extract, s3_client, bucket_name, file_key, file_ext, file_info.get('size'),
+            file_info.get('etag'), max_chars, use_artifacts
+        )
+        download_futures[future] = index
+
+    extract_futures = {}
+    # index -> DownloadBuffer handed to the process pool, closed at the end
+    buffers = {}
+    try:
+        image_indexes = []
+        for future in as_completed(download_futures):
+            index = download_futures[future]
+            try:
+                text, buffer = future.result()
+            except Exception as e:
+                results[index]['error'] = str(e)
+                continue
+            if buffer is None:
+                results[index]['text'] = text
+                continue
+            buffers[index] = buffer
+            file_ext = files_info[index]['file_ext']
+            if file_ext in IMAGE_EXTENSIONS:
+                image_indexes.append(index)
+                continue
+            try:
+                extract_futures[get_extract_pool().submit(
+                    _extract_in_worker, _worker_source(buffer), file_ext, max_chars
+                )] = [index]
+            except Exception as e:
+                results[index]['error'] = str(e)
+
+        if image_indexes:
+            # One job for all images of the task: a single worker batches them
+            # through its OCR reader
+            try:
+                extract_futures[get_extract_pool().submit(
+                    _ocr_in_worker, [_worker_source(buffers[index]) for index in image_indexes], max_chars
+                )] = image_indexes
+            except Exception as e:
+                for index in image_indexes:
+                    results[index]['error'] = str(e)
+
+        for future in as_completed(extract_futures):
+            # Each job covers a list of files: one file, or all images of the task
+            indexes = extract_futures[future]
+            try:
+                texts, worker_metrics = future.result()
+                get_metrics_registry().merge(worker_metrics)
+            except BrokenProcessPool as e:
+                # A worker died (e.g. out of memory); start a fresh pool next time
+                reset_extract_pool()
+                texts, error = None, str(e)
+            except Exception as e:
+                texts, error = None, str(e)
+            if isinstance(texts, str):
+                texts = [texts]
+            for position, index in enumerate(indexes):
+                if texts is None:
+                    results[index]['error'] = error
+                elif isinstance(texts[position], Exception):
+                    results[index]['error'] = str(texts[position])
+                else:
+                    results[index]['text'] = texts[position]
+    finally:
+        # Frees the memory budget and deletes spilled temp files
+        for buffer in buffers.values():
+            buffer.close()
+
+    for index, cache_key in cache_keys.items():
+        text = results[index]['text']
+        # Failed extractions set 'error' and leave 'text' None; never cached
+        if text is not None:
+            extraction_cache.put(cache_key, text)
+
+    return results
@@ -0,0 +1,153 @@
+"""
+Pre-extracts the text of every supported attachment in the bucket.
+
+Run after upload_data_to_s3.py. Each attachment goes through the same
+extractors as the dashboard, and its text is stored gzip-compressed under the
+sidecar prefix (EXTRACTION_ARTIFACT_PREFIX, default "_extracted/") at a key
+derived from the extractor version, the output-affecting settings
+(extraction_module.OUTPUT_SETTINGS, e.g. TABULAR_MODE) and the source ETag.
+The dashboard reads these artifacts and only extracts live when one is
+missing, stale or unreadable; run the job with the dashboard's settings.
+
+Attachments whose artifact is already up to date are skipped, so the job can
+be rerun after every upload or extractor release.
+
+Usage:
+    python preextract_to_s3.py [--workers 4] [--force]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from dotenv import load_dotenv
+
+from artifact_module import artifact_exists, put_extraction_artifact
+from aws_module import ARTIFACT_PREFIX, iter_objects_from_s3
+from extraction_module import SUPPORTED_EXTENSIONS
+from metrics_module import get_metrics_registry
+from pipeline_module import process_task_files
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_WORKERS = int(os.getenv('PREEXTRACT_WORKERS', 4))
+
+
+def list_task_files(s3_client, bucket_name):
+    """
+    Groups the attachments of the bucket by task_id (the key without its
+    extension).
+
+    Returns:
+    - dict: task_id -> list of {'file_name', 'file_ext', 'size', 'etag'}.
+    """
+    task_files = {}
+    for item in iter_objects_from_s3(bucket_name, s3_client):
+        file_base_name, file_ext = os.path.splitext(item['Key'])
+        task_files.setdefault(file_base_name, []).append({
+            'file_name': item['Key'],
+            'file_ext': file_ext.lower(),
+            'size': item['Size'],
+            'etag': item['ETag']
+        })
+    return task_files
+
+
+def preextract_task(s3_client, bucket_name, files_info, force=False):
+    """
+    Extracts the attachments of one task that have no up-to-date artifact
+    and stores their artifacts.
+
+    Returns:
+    - dict: Counts of written, skipped, unsupported and failed files, and
+      the compressed bytes written.
+    """
+    stats = {'written': 0, 'skipped': 0, 'unsupported': 0, 'failed': 0, 'bytes': 0}
+    pending = []
+    for file_info in files_info:
+        if file_info['file_ext'] not in SUPPORTED_EXTENSIONS:
+            stats['unsupported'] += 1
+        elif not force and artifact_exists(s3_client, bucket_name, file_info['file_name'], file_info['etag']):
+            stats['skipped'] += 1
+        else:
+            pending.append(file_info)
+    if not pending:
+        return stats
+
+    # Full text: no character cap and no page hint
+    results = process_task_files(s3_client, bucket_name, pending, use_artifacts=False)
+    for file_info, result in zip(pending, results):
+        text = result['text']
+        if result['error'] is not None:
+            print(f"Error extracting {file_info['file_name']}: {result['error']}")
+            stats['failed'] += 1
+            continue
+        try:
+            stats['bytes'] += put_extraction_artifact(
+                s3_client, bucket_name, file_info['file_name'], file_info['etag'], text
+            )
+        except Exception as e:
+            print(f"Error storing the artifact of {file_info['file_name']}: {e}")
+            stats['failed'] += 1
+            continue
+        stats['written'] += 1
+    return stats
+
+
+def preextract_bucket(s3_client, bucket_name, workers=DEFAULT_WORKERS, force=False):
+    """
+    Pre-extracts all tasks of the bucket, several tasks at a time.
+    """
+    task_files = list_task_files(s3_client, bucket_name)
+    totals = {'written': 0, 'skipped': 0, 'unsupported': 0, 'failed': 0, 'bytes': 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(preextract_task, s3_client, bucket_name, files_info, force): task_id
+            for task_id, files_info in task_files.items()
+        }
+        for future in as_completed(futures):
+            task_id = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                print(f"Error pre-extracting task {task_id}: {e}")
+                totals['failed'] += 1
+                continue
+            for name, value in stats.items():
+                totals[name] += value
+            if stats['written']:
+                print(f"Stored {stats['written']} artifact(s) for task {task_id}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bucket', default=os.getenv('AWS_BUCKET'), help="Bucket holding the attachments")
+    parser.add_argument('--endpoint-url', default=os.getenv('S3_ENDPOINT_URL'), help="S3-compatible endpoint")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Tasks extracted concurrently")
+    parser.add_argument('--force', action='store_true', help="Rebuild artifacts that are already up to date")
+    parser.add_argument('--timings', action='store_true', help="Print per-stage timings at the end")
+    args = parser.parse_args()
+
+    s3_client = boto3.client('s3', endpoint_url=args.endpoint_url)
+
+    start = time.perf_counter()
+    totals = preextract_bucket(s3_client, args.bucket, workers=args.workers, force=args.force)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Stored {totals['written']} artifact(s) under {ARTIFACT_PREFIX}, skipped {totals['skipped']} "
+        f"up to date, {totals['unsupported']} unsupported, {totals['failed']} failed "
+        f"({totals['bytes'] / 1e6:.1f} MB compressed in {elapsed:.1f}s)"
+    )
+    if args.timings:
+        for row in get_metrics_registry().summary():
+            print(
+                f"  {row['stage']:36} {row['count']:6d} calls  total {row['total_seconds']:8.2f}s  "
+                f"p50 {row['p50_seconds'] * 1000:8.1f} ms  p95 {row['p95_seconds'] * 1000:8.1f} ms"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from openai_module import get_openai_client, DEFAULT_MODEL, SYSTEM_PROMPT, MAX_TOKENS
+from metrics_module import timed
+
+# Load environment variables
+load_dotenv()
+
+# Token budget for the whole prompt (system prompt + user prompt)
+DEFAULT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 16000))
+
+# Map-reduce settings used when the extracted text does not fit the budget
+MAP_CHUNK_TOKENS = int(os.getenv('PROMPT_MAP_CHUNK_TOKENS', 6000))
+MAP_MAX_CHUNKS = int(os.getenv('PROMPT_MAP_MAX_CHUNKS', 16))
+MAP_CONCURRENCY = int(os.getenv('PROMPT_MAP_CONCURRENCY', 4))
+MAP_SUMMARY_TOKENS = 400
+
+MAP_PROMPT = (
+    "The following is part {index} of {total} of the files attached to a question.\n"
+    "Extract every fact, number, name and table row from it that could help answer the question. "
+    "Be concise and do not answer the question itself. If nothing is relevant, reply with 'Nothing relevant.'\n\n"
+    "Question:\n{question}\n\n"
+    "File content (part {index} of {total}):\n{chunk}"
+)
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(DEFAULT_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding('o200k_base')
+        except Exception as e:
+            # tiktoken missing, or its encoding files cannot be downloaded
+            print(f"Falling back to approximate token counts: {e}")
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    """
+    Counts the tokens of text for the configured model. Falls back to about
+    4 characters per token when tiktoken is not installed.
+    """
+    encoding = _get_encoding()
+    if not encoding:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_tokens(text, chunk_tokens):
+    """
+    Splits text into consecutive pieces of at most chunk_tokens tokens.
+    """
+    encoding = _get_encoding()
+    if not encoding:
+        chunk_chars = chunk_tokens * 4
+        return [text[start:start + chunk_chars] for start in range(0, len(text), chunk_chars)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[start:start + chunk_tokens]) for start in range(0, len(tokens), chunk_tokens)]
+
+
+def trim_to_tokens(text, max_tokens):
+    """
+    Truncates text to at most max_tokens tokens.
+    """
+    if max_tokens <= 0:
+        return ""
+    pieces = split_tokens(text, max_tokens)
+    return pieces[0] if pieces else ""
+
+
+def _format_prompt(steps, question, extracted_text, summarized=False):
+    # Combine prompt with steps and extracted text if available
+    prompt = f"Steps:\n{steps}\n\nQuestion:\n{question}\n"
+    if extracted_text:
+        label = "Extracted Text (summarized)" if summarized else "Extracted Text"
+        prompt += f"\n{label}:\n{extracted_text}"
+    return prompt
+
+
+def _map_prompts(question, chunks):
+    return [
+        MAP_PROMPT.format(index=index, total=len(chunks), question=question, chunk=chunk)
+        for index, chunk in enumerate(chunks, start=1)
+    ]
+
+
+def _summarize_chunks(question, chunks, use_cache):
+    # The sync client is shared by all calls, so no per-call clients are created
+    client = get_openai_client()
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as pool:
+        return list(pool.map(
+            lambda map_prompt: client.complete(map_prompt, max_tokens=MAP_SUMMARY_TOKENS, use_cache=use_cache),
+            _map_prompts(question, chunks)
+        ))
+
+
+async def _asummarize_chunks(question, chunks, use_cache):
+    client = get_openai_client()
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+
+    async def summarize(map_prompt):
+        async with semaphore:
+            return await client.acomplete(map_prompt, max_tokens=MAP_SUMMARY_TOKENS, use_cache=use_cache)
+
+    return await asyncio.gather(*(summarize(map_prompt) for map_prompt in _map_prompts(question, chunks)))
+
+
+def _fit_prompt(steps, question, extracted_text, token_budget):
+    """
+    Fits steps, question and extracted text into token_budget.
+
+    Returns:
+    - tuple: (prompt, None, None) when no summaries are needed, otherwise
+      (None, chunks, text_budget) with the chunks of extracted text to
+      summarize and the tokens left for the summaries.
+    """
+    token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+    # Leave room for the system prompt and the answer
+    available = token_budget - count_tokens(SYSTEM_PROMPT) - MAX_TOKENS
+
+    base_prompt = _format_prompt(steps, question, "")
+    base_tokens = count_tokens(base_prompt)
+    if base_tokens >= available:
+        # Even without attachments the prompt is too long; keep the question intact
+        steps = trim_to_tokens(steps, available - count_tokens(_format_prompt("", question, "")))
+        return _format_prompt(steps, question, ""), None, None
+
+    if not extracted_text:
+        return base_prompt, None, None
+
+    text_budget = available - base_tokens
+    if count_tokens(extracted_text) <= text_budget:
+        return _format_prompt(steps, question, extracted_text), None, None
+
+    chunks = split_tokens(extracted_text, MAP_CHUNK_TOKENS)[:MAP_MAX_CHUNKS]
+    return None, chunks, text_budget
+
+
+def _reduce_prompt(steps, question, summaries, text_budget):
+    summarized_text = "\n\n".join(
+        f"[Part {index}] {summary}" for index, summary in enumerate(summaries, start=1)
+    )
+    return _format_prompt(steps, question, trim_to_tokens(summarized_text, text_budget), summarized=True)
+
+
+@timed('prompt.build')
+def build_prompt(steps, question, extracted_text, token_budget=None, use_cache=True):
+    """
+    Builds the user prompt so that the request stays within token_budget.
+
+    If steps, question and extracted text fit, they are sent verbatim. Otherwise
+    the extracted text is split into chunks that are summarized concurrently
+    with respect to the question (map), and the answer prompt is built from
+    the summaries (reduce). At most MAP_MAX_CHUNKS chunks are summarized, so
+    the time per request stays bounded however large the attachments are.
+
+    Parameters:
+    - steps (str): The annotated steps.
+    - question (str): The task question.
+    - extracted_text (str): Text extracted from the task's attachments.
+    - token_budget (int, optional): Defaults to PROMPT_TOKEN_BUDGET.
+    - use_cache (bool): Passed on to the OpenAI response cache for map calls.
+
+    Returns:
+    - str: The prompt to send with send_to_openai().
+    """
+    prompt, chunks, text_budget = _fit_prompt(steps, question, extracted_text, token_budget)
+    if prompt is not None:
+        return prompt
+    summaries = _summarize_chunks(question, chunks, use_cache)
+    return _reduce_prompt(steps, question, summaries, text_budget)
+
+
+@timed('prompt.build')
+async def abuild_prompt(steps, question, extracted_text, token_budget=None, use_cache=True):
+    """
+    Async variant of build_prompt() for callers that already run an event
+    loop (e.g. batch_eval.py); the map calls share that loop's client.
+    """
+    prompt, chunks, text_budget = _fit_prompt(steps, question, extracted_text, token_budget)
+    if prompt is not None:
+        return prompt
+    summaries = await _asummarize_chunks(question, chunks, use_cache)
+    return _reduce_prompt(steps, question, summaries, text_budget)
@@ -0,0 +1,130 @@
+import gc
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Seconds a resource may sit unused before it is torn down
+DEFAULT_IDLE_TIMEOUT = 600
+
+
+class ResourceManager:
+    """
+    Process-wide registry of expensive, lazily built resources (e.g. ML models).
+
+    A resource is built by its factory on first use, shared by every caller in
+    the process (all Streamlit sessions and reruns), and dropped again after it
+    has been idle for idle_timeout seconds so that memory is returned on quiet
+    replicas.
+    """
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._factories = {}
+        self._resources = {}
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._reaper = None
+
+    def register(self, name, factory):
+        """
+        Registers a zero-argument factory under name. Nothing is built yet.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._build_locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """
+        Returns the resource registered under name, building it if needed.
+        """
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"Unknown resource: {name}")
+            resource = self._resources.get(name)
+            if resource is not None:
+                self._last_used[name] = time.monotonic()
+                return resource
+            build_lock = self._build_locks[name]
+
+        # Build outside the registry lock so other resources stay available;
+        # the per-resource lock makes sure only one caller pays the build cost.
+        with build_lock:
+            with self._lock:
+                resource = self._resources.get(name)
+            if resource is None:
+                resource = self._factories[name]()
+                with self._lock:
+                    self._resources[name] = resource
+            with self._lock:
+                self._last_used[name] = time.monotonic()
+            self._start_reaper()
+            return resource
+
+    def release(self, name):
+        """
+        Drops the resource registered under name; it is rebuilt on next use.
+        """
+        with self._lock:
+            self._resources.pop(name, None)
+            self._last_used.pop(name, None)
+        gc.collect()
+
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._resources
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap_idle, name="resource-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_idle(self):
+        interval = max(1.0, self.idle_timeout / 4)
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._lock:
+                idle = [
+                    name for name, last_used in self._last_used.items()
+                    if now - last_used >= self.idle_timeout
+                ]
+            for name in idle:
+                # Do not tear down a resource while it is being rebuilt
+                with self._build_locks[name]:
+                    with self._lock:
+                        last_used = self._last_used.get(name)
+                        if last_used is None or time.monotonic() - last_used < self.idle_timeout:
+                            continue
+                        self._resources.pop(name, None)
+                        self._last_used.pop(name, None)
+            if idle:
+                gc.collect()
+            with self._lock:
+                if not self._resources:
+                    self._reaper = None
+                    return
+
+
+def _build_ocr_reader():
+    import easyocr
+    return easyocr.Reader(['en'], gpu=False)
+
+
+resource_manager = ResourceManager(
+    idle_timeout=float(os.getenv('RESOURCE_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT))
+)
+resource_manager.register('ocr_reader', _build_ocr_reader)
+
+
+def get_ocr_reader():
+    """
+    Returns the shared EasyOCR reader, loading the model on first use.
+    """
+    return resource_manager.get('ocr_reader')
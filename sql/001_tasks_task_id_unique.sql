@@ -0,0 +1,6 @@
+-- upload_metadata_rdb.py MERGEs on task_id; make it unique and indexed.
+-- Remove duplicate rows left by earlier non-idempotent loads first:
+--   WITH d AS (SELECT ROW_NUMBER() OVER (PARTITION BY task_id ORDER BY (SELECT 0)) AS rn FROM Tasks)
+--   DELETE FROM d WHERE rn > 1;
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_Tasks_task_id' AND object_id = OBJECT_ID('Tasks'))
+    CREATE UNIQUE INDEX UX_Tasks_task_id ON Tasks (task_id);
@@ -0,0 +1,7 @@
+-- sql_module.MetadataCache refreshes incrementally by fetching only rows whose
+-- row_version is newer than the newest one it has seen.
+IF COL_LENGTH('Tasks', 'row_version') IS NULL
+    ALTER TABLE Tasks ADD row_version rowversion;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Tasks_row_version' AND object_id = OBJECT_ID('Tasks'))
+    CREATE INDEX IX_Tasks_row_version ON Tasks (row_version);
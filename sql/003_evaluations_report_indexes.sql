@@ -0,0 +1,5 @@
+-- Index used by the dashboard's SQL-side reports (sql_module): the
+-- inter-evaluation time histogram orders by evaluation_timestamp. The
+-- detailed table pages on the evaluation_id primary key and needs no index.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Evaluations_timestamp' AND object_id = OBJECT_ID('Evaluations'))
+    CREATE INDEX IX_Evaluations_timestamp ON Evaluations (evaluation_timestamp, evaluation_id);
@@ -0,0 +1,20 @@
+-- Daily feedback term and bigram counts, kept current by
+-- sql_module.insert_evaluation / insert_evaluations_bulk and read by the
+-- "Top 5 Most Common Feedback Themes" chart. After creating the tables,
+-- index the existing feedback once with:
+--     python -c "from sql_module import rebuild_feedback_index; print(rebuild_feedback_index())"
+IF OBJECT_ID('FeedbackTerms') IS NULL
+    CREATE TABLE FeedbackTerms (
+        bucket_date DATE NOT NULL,
+        term NVARCHAR(200) NOT NULL,
+        term_count INT NOT NULL,
+        CONSTRAINT PK_FeedbackTerms PRIMARY KEY (bucket_date, term)
+    );
+GO
+IF OBJECT_ID('FeedbackBigrams') IS NULL
+    CREATE TABLE FeedbackBigrams (
+        bucket_date DATE NOT NULL,
+        term NVARCHAR(200) NOT NULL,
+        term_count INT NOT NULL,
+        CONSTRAINT PK_FeedbackBigrams PRIMARY KEY (bucket_date, term)
+    );
@@ -3,55 +3,347 @@ import pyodbc
 from dotenv import load_dotenv
 import json
 import datetime
+import queue
+import threading
+import time
+from contextlib import contextmanager
 
+from feedback_module import count_feedback_terms
+from metrics_module import span, timed
 
-def get_metadata_from_sql():
-    # Load .env file
-    load_dotenv()
-
-    # SQL Server connection settings
-    ##server = os.getenv('SQL_SERVER')
-    database = os.getenv('SQL_DATABASE')
-    ##username = os.getenv('SQL_USER')
-    localhost = 'localhost,1433'
-    ##password = os.getenv('SQL_PASSWORD')
-    driver = '{ODBC Driver 17 for SQL Server}'
-
-    # Establish connection
-    connection = pyodbc.connect(
-        f"DRIVER={driver};SERVER={localhost};DATABASE={database};UID=sa;PWD=Shraddha123;"
+# Load .env file
+load_dotenv()
+
+# SQL Server connection settings (the single place they are read). The
+# database and password have no defaults and must come from the environment.
+SQL_SERVER = os.getenv('SQL_SERVER', 'localhost,1433')
+SQL_DATABASE = os.getenv('SQL_DATABASE')
+SQL_USER = os.getenv('SQL_USER', 'sa')
+SQL_PASSWORD = os.getenv('SQL_PASSWORD')
+SQL_DRIVER = os.getenv('SQL_DRIVER', '{ODBC Driver 17 for SQL Server}')
+
+# Connection pool settings
+SQL_POOL_SIZE = int(os.getenv('SQL_POOL_SIZE', 10))
+SQL_POOL_TIMEOUT = float(os.getenv('SQL_POOL_TIMEOUT', 30))
+# Idle connections older than this are checked with a ping before reuse
+SQL_POOL_HEALTH_CHECK_AFTER = float(os.getenv('SQL_POOL_HEALTH_CHECK_AFTER', 60))
+
+
+def get_connection_string():
+    """
+    Builds the ODBC connection string from the SQL_* environment variables.
+
+    Raises:
+    - RuntimeError: If SQL_DATABASE or SQL_PASSWORD is not set.
+    """
+    missing = [name for name, value in (('SQL_DATABASE', SQL_DATABASE), ('SQL_PASSWORD', SQL_PASSWORD)) if not value]
+    if missing:
+        raise RuntimeError(f"{' and '.join(missing)} must be set in the environment or .env to connect to SQL Server")
+    return (
+        f"DRIVER={SQL_DRIVER};SERVER={SQL_SERVER};DATABASE={SQL_DATABASE};"
+        f"UID={SQL_USER};PWD={SQL_PASSWORD};"
     )
-    
-    cursor = connection.cursor()
-    
-    # Execute query to fetch necessary fields
-    cursor.execute('''
-        SELECT task_id, Question, Final_answer, Steps, Number_of_steps, 
-               How_long_did_this_take, Tools, Number_of_tools 
-        FROM Tasks
-    ''')
-    rows = cursor.fetchall()
-    
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of pyodbc connections shared by all Streamlit sessions.
+
+    At most max_size connections are open at once; callers block for up to
+    timeout seconds when all of them are borrowed. Connections run in
+    autocommit mode so a single statement costs a single round-trip, and
+    connections that sat idle for a while are pinged before being handed out.
+    """
+
+    def __init__(self, connection_string, max_size=SQL_POOL_SIZE, timeout=SQL_POOL_TIMEOUT,
+                 health_check_after=SQL_POOL_HEALTH_CHECK_AFTER):
+        self.connection_string = connection_string
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        # LIFO keeps the most recently used (warm) connections in play
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _connect(self):
+        return pyodbc.connect(self.connection_string, autocommit=True)
+
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except pyodbc.Error:
+            pass
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No SQL connection available within {self.timeout} seconds")
+        try:
+            while True:
+                try:
+                    connection, returned_at = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - returned_at < self.health_check_after or self._is_healthy(connection):
+                    return connection
+                self._discard(connection)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, connection, broken=False):
+        try:
+            if broken:
+                self._discard(connection)
+            else:
+                self._idle.put((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, transaction=False):
+        """
+        Borrows a connection for the duration of a with block.
+
+        Parameters:
+        - transaction (bool): Run the block in one transaction that is
+          committed on success and rolled back on error.
+        """
+        with span('sql.pool_acquire'):
+            connection = self._acquire()
+        broken = False
+        try:
+            if transaction:
+                connection.autocommit = False
+            yield connection
+            if transaction:
+                connection.commit()
+        except (pyodbc.OperationalError, pyodbc.InterfaceError):
+            # The connection itself is unusable; do not return it to the pool
+            broken = True
+            raise
+        except Exception:
+            if transaction:
+                try:
+                    connection.rollback()
+                except pyodbc.Error:
+                    broken = True
+            raise
+        finally:
+            if transaction and not broken:
+                try:
+                    connection.autocommit = True
+                except pyodbc.Error:
+                    broken = True
+            self._release(connection, broken)
+
+    def close(self):
+        """
+        Closes all idle connections.
+        """
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(connection)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(get_connection_string())
+        return _pool
+
+
+# Columns selected for a task's metadata
+TASK_METADATA_COLUMNS = '''
+    task_id, Question, Level, Final_answer, Steps, Number_of_steps,
+    How_long_did_this_take, Tools, Number_of_tools
+'''
+
+
+def _row_to_metadata(row):
+    return {
+        'task_id': row.task_id,
+        'Question': row.Question,
+        'Level': row.Level,
+        'Final answer': row.Final_answer,
+        'Steps': row.Steps,
+        'Number of steps': row.Number_of_steps,
+        'How long did this take?': row.How_long_did_this_take,
+        'Tools': row.Tools,
+        'Number of tools': row.Number_of_tools
+    }
+
+
+@timed('sql.get_metadata_from_sql')
+def get_metadata_from_sql():
+    with get_connection_pool().connection() as connection:
+        cursor = connection.cursor()
+
+        # Execute query to fetch necessary fields
+        cursor.execute(f'SELECT {TASK_METADATA_COLUMNS} FROM Tasks')
+        rows = cursor.fetchall()
+        cursor.close()
+
     # Organize the fetched data into a list of dictionaries
-    metadata = []
-    for row in rows:
-        metadata.append({
-            'task_id': row.task_id,
-            'Question': row.Question,
-            'Final answer': row.Final_answer,
-            'Steps': row.Steps,
-            'Number of steps': row.Number_of_steps,
-            'How long did this take?': row.How_long_did_this_take,
-            'Tools': row.Tools,
-            'Number of tools': row.Number_of_tools
-        })
-
-    # Close the database connection
-    cursor.close()
-    connection.close()
-
-    return metadata
+    return [_row_to_metadata(row) for row in rows]
+
+
+class MetadataCache:
+    """
+    Process-wide cache of the Tasks metadata used by the dashboard.
+
+    The cache is only refreshed after invalidate() (called by
+    update_metadata_steps) or once ttl seconds have passed, so ordinary widget
+    interactions never reach the database. Refreshes are incremental: only
+    rows whose row_version is newer than the newest one seen are fetched
+    (see sql/002_tasks_row_version.sql). Without that column, or when rows
+    were deleted, the whole table is reloaded instead.
+
+    Invalidation is per process; other replicas pick up changes within ttl.
+    """
+
+    def __init__(self, ttl=float(os.getenv('METADATA_CACHE_TTL', 300))):
+        self.ttl = ttl
+        self._records = {}
+        self._index = None
+        self._max_row_version = None
+        self._has_row_version = True
+        self._refreshed_at = None
+        self._dirty = True
+        self._lock = threading.Lock()
+
+    def invalidate(self, task_id=None):
+        """
+        Marks the cache stale so the next read refreshes it.
+
+        Parameters:
+        - task_id (str, optional): The task that changed (informational; the
+          incremental refresh finds changed rows by row_version).
+        """
+        with self._lock:
+            self._dirty = True
 
+    def _is_stale(self):
+        return (
+            self._dirty
+            or self._refreshed_at is None
+            or time.monotonic() - self._refreshed_at >= self.ttl
+        )
+
+    def _full_reload(self, cursor):
+        if self._has_row_version:
+            try:
+                cursor.execute(f'SELECT {TASK_METADATA_COLUMNS}, row_version FROM Tasks')
+            except pyodbc.ProgrammingError:
+                # Migration not applied; fall back to full reloads
+                self._has_row_version = False
+        if not self._has_row_version:
+            cursor.execute(f'SELECT {TASK_METADATA_COLUMNS} FROM Tasks')
+
+        rows = cursor.fetchall()
+        self._records = {row.task_id: _row_to_metadata(row) for row in rows}
+        self._max_row_version = (
+            max((row.row_version for row in rows), default=None) if self._has_row_version else None
+        )
+
+    def _incremental_refresh(self, cursor):
+        """
+        Fetches the rows changed since the last refresh. Returns how many
+        there were, or None when deleted rows forced a full reload.
+        """
+        cursor.execute(
+            f'''
+            SELECT {TASK_METADATA_COLUMNS}, row_version FROM Tasks WHERE row_version > ?;
+            SELECT COUNT(*) FROM Tasks;
+            ''',
+            self._max_row_version
+        )
+        rows = cursor.fetchall()
+        cursor.nextset()
+        total = cursor.fetchone()[0]
+
+        for row in rows:
+            self._records[row.task_id] = _row_to_metadata(row)
+            self._max_row_version = max(self._max_row_version, row.row_version)
+
+        if total != len(self._records):
+            # Rows were deleted; row_version cannot tell which
+            self._full_reload(cursor)
+            return None
+        return len(rows)
+
+    def _refresh(self):
+        with get_connection_pool().connection() as connection:
+            cursor = connection.cursor()
+            if self._has_row_version and self._max_row_version is not None:
+                changed = self._incremental_refresh(cursor)
+            else:
+                self._full_reload(cursor)
+                changed = None
+            cursor.close()
+
+        # changed is None after a full reload, which always rebuilds the index
+        if changed != 0:
+            records = list(self._records.values())
+            self._index = {
+                'records': records,
+                'task_ids': [record['task_id'] for record in records],
+                'questions': {record['task_id']: record['Question'] for record in records},
+                'final_answers': {record['task_id']: record['Final answer'] for record in records},
+                'steps': {record['task_id']: record['Steps'] for record in records},
+            }
+        self._refreshed_at = time.monotonic()
+        self._dirty = False
+
+    def get(self):
+        """
+        Returns the cached metadata, refreshing it first if it is stale.
+
+        Returns:
+        - dict: 'records' (list of dict, as from get_metadata_from_sql),
+          'task_ids' (list), and 'questions', 'final_answers' and 'steps'
+          (dicts keyed by task_id). Treat the result as read-only.
+        """
+        with self._lock:
+            if self._is_stale():
+                with span('sql.metadata_refresh'):
+                    self._refresh()
+            return self._index
+
+
+metadata_cache = MetadataCache()
+
+
+@timed('sql.get_cached_metadata')
+def get_cached_metadata():
+    """
+    Returns the task metadata from the process-wide cache (see MetadataCache.get).
+    """
+    return metadata_cache.get()
+
+@timed('sql.update_metadata_steps')
 def update_metadata_steps(task_id, new_steps):
     """
     Updates the 'Steps' field for a given task_id.
@@ -63,48 +355,39 @@ def update_metadata_steps(task_id, new_steps):
     Returns:
     - bool: True if the update was successful, False otherwise.
     """
-    load_dotenv()
-
-    # Read SQL Server connection settings from environment variables
-    database = os.getenv('SQL_DATABASE')
-    ##username = os.getenv('SQL_USER')
-    localhost = 'localhost,1433'
-    ##password = os.getenv('SQL_PASSWORD')
-    driver = '{ODBC Driver 17 for SQL Server}'
-
     try:
-        # Establish connection
-        connection = pyodbc.connect(
-            f"DRIVER={driver};SERVER={localhost};DATABASE={database};UID=sa;PWD=Shraddha123;"
-        )
-        cursor = connection.cursor()
+        with get_connection_pool().connection() as connection:
+            cursor = connection.cursor()
 
-        # Update the 'Steps' column for the given task_id
-        cursor.execute(
-            '''
-            UPDATE Tasks 
-            SET Steps = ? 
-            WHERE task_id = ?
-            ''',
-            new_steps,
-            task_id
-        )
-        connection.commit()
+            # Update the 'Steps' column for the given task_id
+            cursor.execute(
+                '''
+                UPDATE Tasks
+                SET Steps = ?
+                WHERE task_id = ?
+                ''',
+                new_steps,
+                task_id
+            )
+            cursor.close()
         success = True
+        metadata_cache.invalidate(task_id)
 
     except Exception as e:
         print(f"Error updating Steps: {e}")
         success = False
-    finally:
-        # Ensure the connection is closed
-        cursor.close()
-        connection.close()
 
     return success
 
+# user_feedback of the evaluations scored automatically by batch_eval.py, so
+# that reports can tell them apart from human judgments
+AUTOMATIC_EVALUATION_FEEDBACK = 'Automatic score (batch_eval.py)'
+
+@timed('sql.insert_evaluation')
 def insert_evaluation(task_id, is_correct, user_feedback=None):
     """
-    Inserts a new evaluation record into the Evaluations table.
+    Inserts a new evaluation record into the Evaluations table and adds its
+    feedback to the feedback term index.
 
     Parameters:
     - task_id (str): The unique identifier for the task.
@@ -114,47 +397,82 @@ def insert_evaluation(task_id, is_correct, user_feedback=None):
     Returns:
     - bool: True if insertion was successful, False otherwise.
     """
-    load_dotenv()
+    try:
+        evaluation_timestamp = datetime.datetime.now()
+        # The index update must commit together with the evaluation
+        with get_connection_pool().connection(transaction=bool(user_feedback)) as connection:
+            cursor = connection.cursor()
+
+            # Insert into Evaluations
+            cursor.execute(
+                '''
+                INSERT INTO Evaluations (task_id, is_correct, user_feedback, evaluation_timestamp)
+                VALUES (?, ?, ?, ?)
+                ''',
+                task_id,
+                int(is_correct),  # Convert boolean to integer (1 or 0)
+                user_feedback,
+                evaluation_timestamp
+            )
+            _update_feedback_index(cursor, [(evaluation_timestamp, user_feedback)])
+            cursor.close()
+        success = True
 
-    # Read SQL Server connection settings from environment variables
-    database = os.getenv('SQL_DATABASE')
-    ##username = os.getenv('SQL_USER')
-    localhost = 'localhost,1433'
-    ##password = os.getenv('SQL_PASSWORD')
-    driver = '{ODBC Driver 17 for SQL Server}'
+    except Exception as e:
+        print(f"Error inserting evaluation: {e}")
+        success = False
 
-    try:
-        # Establish connection
-        connection = pyodbc.connect(
-            f"DRIVER={driver};SERVER={localhost};DATABASE={database};UID=sa;PWD=Shraddha123;"
-        )
-        cursor = connection.cursor()
+    return success
 
-        # Insert into Evaluations
-        cursor.execute(
-            '''
-            INSERT INTO Evaluations (task_id, is_correct, user_feedback, evaluation_timestamp)
-            VALUES (?, ?, ?, ?)
-            ''',
-            task_id,
-            int(is_correct),  # Convert boolean to integer (1 or 0)
-            user_feedback,
-            datetime.datetime.now()
-        )
+@timed('sql.insert_evaluations_bulk')
+def insert_evaluations_bulk(evaluations):
+    """
+    Inserts many evaluation records into the Evaluations table in one batch.
+
+    Parameters:
+    - evaluations (list of dict): Records with 'task_id', 'is_correct' and
+      optionally 'user_feedback' and 'evaluation_timestamp'.
+
+    Returns:
+    - bool: True if insertion was successful, False otherwise.
+    """
+    if not evaluations:
+        return True
 
-        connection.commit()
+    try:
+        with get_connection_pool().connection(transaction=True) as connection:
+            cursor = connection.cursor()
+            # Send all parameter rows in a single round-trip
+            cursor.fast_executemany = True
+
+            now = datetime.datetime.now()
+            rows = [
+                (
+                    evaluation['task_id'],
+                    int(evaluation['is_correct']),
+                    evaluation.get('user_feedback'),
+                    evaluation.get('evaluation_timestamp') or now
+                )
+                for evaluation in evaluations
+            ]
+            cursor.executemany(
+                '''
+                INSERT INTO Evaluations (task_id, is_correct, user_feedback, evaluation_timestamp)
+                VALUES (?, ?, ?, ?)
+                ''',
+                rows
+            )
+            _update_feedback_index(cursor, [(row[3], row[2]) for row in rows])
+            cursor.close()
         success = True
 
     except Exception as e:
-        print(f"Error inserting evaluation: {e}")
+        print(f"Error inserting evaluations: {e}")
         success = False
-    finally:
-        # Ensure the connection is closed
-        cursor.close()
-        connection.close()
 
     return success
 
+@timed('sql.get_evaluations')
 def get_evaluations():
     """
     Retrieves all evaluation records from the Evaluations table.
@@ -162,25 +480,14 @@ def get_evaluations():
     Returns:
     - list of dict: Each dictionary represents an evaluation record.
     """
-    load_dotenv()
-
-    # Read SQL Server connection settings from environment variables
-    database = os.getenv('SQL_DATABASE')
-    ##username = os.getenv('SQL_USER')
-    localhost = 'localhost,1433'
-    ##password = os.getenv('SQL_PASSWORD')
-    driver = '{ODBC Driver 17 for SQL Server}'  
-
     try:
-        # Establish connection
-        connection = pyodbc.connect(
-            f"DRIVER={driver};SERVER={localhost};DATABASE={database};UID=sa;PWD=Shraddha123;"
-        )
-        cursor = connection.cursor()
+        with get_connection_pool().connection() as connection:
+            cursor = connection.cursor()
 
-        # Fetch all evaluations
-        cursor.execute('SELECT evaluation_id, task_id, is_correct, user_feedback, evaluation_timestamp FROM Evaluations')
-        rows = cursor.fetchall()
+            # Fetch all evaluations
+            cursor.execute('SELECT evaluation_id, task_id, is_correct, user_feedback, evaluation_timestamp FROM Evaluations')
+            rows = cursor.fetchall()
+            cursor.close()
 
         # Organize into list of dictionaries
         evaluations = []
@@ -196,9 +503,314 @@ def get_evaluations():
     except Exception as e:
         print(f"Error retrieving evaluations: {e}")
         evaluations = []
-    finally:
-        # Ensure the connection is closed
-        cursor.close()
-        connection.close()
 
     return evaluations
+
+@timed('sql.get_evaluation_summary')
+def get_evaluation_summary():
+    """
+    Computes the evaluation counts in SQL. Only human judgments are counted;
+    evaluations scored by batch_eval.py are left out.
+
+    Returns:
+    - dict: 'total', 'correct' and 'incorrect' evaluation counts.
+    """
+    try:
+        with get_connection_pool().connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                '''
+                SELECT COUNT(*) AS total,
+                       COALESCE(SUM(CAST(is_correct AS INT)), 0) AS correct
+                FROM Evaluations
+                WHERE user_feedback IS NULL OR user_feedback <> ?
+                ''',
+                AUTOMATIC_EVALUATION_FEEDBACK
+            )
+            row = cursor.fetchone()
+            cursor.close()
+        summary = {'total': row.total, 'correct': row.correct, 'incorrect': row.total - row.correct}
+
+    except Exception as e:
+        print(f"Error retrieving evaluation summary: {e}")
+        summary = {'total': 0, 'correct': 0, 'incorrect': 0}
+
+    return summary
+
+@timed('sql.get_evaluation_time_histogram')
+def get_evaluation_time_histogram(bins=30):
+    """
+    Bins the time between consecutive human evaluations in SQL (LAG
+    window) so that only the bin counts leave the database.
+
+    Parameters:
+    - bins (int): Number of equal-width bins.
+
+    Returns:
+    - dict: 'average_minutes' (float or None) and 'bins', a list of dicts
+      with 'start', 'end' (minutes) and 'count'.
+    """
+    try:
+        with get_connection_pool().connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                '''
+                WITH diffs AS (
+                    SELECT DATEDIFF_BIG(
+                               millisecond,
+                               LAG(evaluation_timestamp) OVER (ORDER BY evaluation_timestamp, evaluation_id),
+                               evaluation_timestamp
+                           ) / 60000.0 AS diff_minutes
+                    FROM Evaluations
+                    WHERE user_feedback IS NULL OR user_feedback <> ?
+                ),
+                bounds AS (
+                    SELECT diff_minutes,
+                           MIN(diff_minutes) OVER () AS lo,
+                           MAX(diff_minutes) OVER () AS hi,
+                           AVG(diff_minutes) OVER () AS average_minutes
+                    FROM diffs
+                    WHERE diff_minutes IS NOT NULL
+                ),
+                binned AS (
+                    SELECT CASE
+                               WHEN hi = lo THEN 0
+                               WHEN diff_minutes = hi THEN ? - 1
+                               ELSE CAST(FLOOR((diff_minutes - lo) * ? / (hi - lo)) AS INT)
+                           END AS bin,
+                           lo, hi, average_minutes
+                    FROM bounds
+                )
+                SELECT bin, MIN(lo) AS lo, MIN(hi) AS hi, MIN(average_minutes) AS average_minutes,
+                       COUNT(*) AS bin_count
+                FROM binned
+                GROUP BY bin
+                ORDER BY bin
+                ''',
+                AUTOMATIC_EVALUATION_FEEDBACK,
+                bins,
+                bins
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+
+        histogram = {'average_minutes': None, 'bins': []}
+        if rows:
+            lo, hi = float(rows[0].lo), float(rows[0].hi)
+            width = (hi - lo) / bins if hi > lo else 0.0
+            histogram['average_minutes'] = float(rows[0].average_minutes)
+            histogram['bins'] = [
+                {
+                    'start': lo + row.bin * width,
+                    'end': lo + (row.bin + 1) * width if width else hi,
+                    'count': row.bin_count
+                }
+                for row in rows
+            ]
+
+    except Exception as e:
+        print(f"Error retrieving evaluation time histogram: {e}")
+        histogram = {'average_minutes': None, 'bins': []}
+
+    return histogram
+
+@timed('sql.get_evaluations_page')
+def get_evaluations_page(before_id=None, page_size=50):
+    """
+    Fetches one page of evaluations, newest first, using keyset pagination
+    on evaluation_id (no OFFSET scans, constant cost per page).
+
+    Parameters:
+    - before_id (int, optional): Only return evaluations with a smaller
+      evaluation_id; None for the first page.
+    - page_size (int): Number of records per page.
+
+    Returns:
+    - tuple: (list of dict, bool has_more)
+    """
+    try:
+        with get_connection_pool().connection() as connection:
+            cursor = connection.cursor()
+            # One extra row tells whether another page exists; the first page
+            # has no bound so each query stays a plain seek on the primary key
+            query = '''
+                SELECT TOP (?) evaluation_id, task_id, is_correct, user_feedback, evaluation_timestamp
+                FROM Evaluations
+                {where}
+                ORDER BY evaluation_id DESC
+            '''
+            if before_id is None:
+                cursor.execute(query.format(where=''), page_size + 1)
+            else:
+                cursor.execute(query.format(where='WHERE evaluation_id < ?'), page_size + 1, before_id)
+            rows = cursor.fetchall()
+            cursor.close()
+
+        evaluations = [
+            {
+                'evaluation_id': row.evaluation_id,
+                'task_id': row.task_id,
+                'is_correct': bool(row.is_correct),
+                'user_feedback': row.user_feedback,
+                'evaluation_timestamp': row.evaluation_timestamp
+            }
+            for row in rows[:page_size]
+        ]
+        has_more = len(rows) > page_size
+
+    except Exception as e:
+        print(f"Error retrieving evaluations: {e}")
+        evaluations, has_more = [], False
+
+    return evaluations, has_more
+
+# Feedback index tables (see sql/004_feedback_term_index.sql)
+FEEDBACK_INDEX_TABLES = {'terms': 'FeedbackTerms', 'bigrams': 'FeedbackBigrams'}
+
+
+def _add_feedback_increments(increments, feedback_rows):
+    """
+    Tokenizes feedback and adds its term and bigram counts to increments,
+    a dict of kind -> {(day, term): count}.
+    """
+    for evaluation_timestamp, user_feedback in feedback_rows:
+        if not user_feedback or user_feedback == AUTOMATIC_EVALUATION_FEEDBACK:
+            continue
+        bucket_date = evaluation_timestamp.date()
+        terms, bigrams = count_feedback_terms(user_feedback)
+        for kind, counts in (('terms', terms), ('bigrams', bigrams)):
+            kind_increments = increments.setdefault(kind, {})
+            for term, count in counts.items():
+                key = (bucket_date, term)
+                kind_increments[key] = kind_increments.get(key, 0) + count
+    return increments
+
+def _write_feedback_increments(cursor, increments):
+    for kind, table in FEEDBACK_INDEX_TABLES.items():
+        if not increments.get(kind):
+            continue
+        cursor.executemany(
+            f'''
+            MERGE {table} WITH (HOLDLOCK) AS target
+            USING (SELECT CAST(? AS DATE) AS bucket_date, CAST(? AS NVARCHAR(200)) AS term, ? AS term_count) AS source
+            ON target.bucket_date = source.bucket_date AND target.term = source.term
+            WHEN MATCHED THEN
+                UPDATE SET target.term_count = target.term_count + source.term_count
+            WHEN NOT MATCHED THEN
+                INSERT (bucket_date, term, term_count) VALUES (source.bucket_date, source.term, source.term_count);
+            ''',
+            [(bucket_date, term, count) for (bucket_date, term), count in increments[kind].items()]
+        )
+
+# Cleared when the index tables are missing (migration 004 not applied)
+_feedback_index_available = True
+
+
+def _update_feedback_index(cursor, feedback_rows):
+    """
+    Adds the terms and bigrams of new feedback to the daily counts in
+    FeedbackTerms and FeedbackBigrams. Only the new feedback is tokenized,
+    so the cost does not depend on how much feedback is already stored.
+
+    If the tables do not exist, the index update is rolled back to a
+    savepoint and skipped from then on; the evaluations are still committed.
+
+    Parameters:
+    - cursor: Cursor inside the transaction that inserts the evaluations.
+    - feedback_rows (list of tuple): (evaluation_timestamp, user_feedback).
+    """
+    global _feedback_index_available
+    if not _feedback_index_available:
+        return
+    increments = _add_feedback_increments({}, feedback_rows)
+    if not increments:
+        return
+
+    cursor.execute('SAVE TRANSACTION feedback_index')
+    try:
+        _write_feedback_increments(cursor, increments)
+    except pyodbc.ProgrammingError as e:
+        # Migration not applied; keep the evaluations and stop indexing
+        cursor.execute('ROLLBACK TRANSACTION feedback_index')
+        _feedback_index_available = False
+        print(f"Feedback term index unavailable, skipping it: {e}")
+
+@timed('sql.get_top_feedback_terms')
+def get_top_feedback_terms(limit=5, since=None, until=None, bigrams=False):
+    """
+    Reads the most frequent feedback terms from the term index.
+
+    Parameters:
+    - limit (int): Number of terms to return.
+    - since (datetime.date, optional): First day included.
+    - until (datetime.date, optional): Last day included.
+    - bigrams (bool): Return two-word phrases instead of single terms.
+
+    Returns:
+    - list of tuple: (term, count), most frequent first.
+    """
+    table = FEEDBACK_INDEX_TABLES['bigrams' if bigrams else 'terms']
+    conditions, params = [], []
+    if since is not None:
+        conditions.append('bucket_date >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append('bucket_date <= ?')
+        params.append(until)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    try:
+        with get_connection_pool().connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                f'''
+                SELECT TOP (?) term, SUM(term_count) AS term_count
+                FROM {table}
+                {where}
+                GROUP BY term
+                ORDER BY SUM(term_count) DESC, term
+                ''',
+                limit,
+                *params
+            )
+            top_terms = [(row.term, row.term_count) for row in cursor.fetchall()]
+            cursor.close()
+
+    except Exception as e:
+        print(f"Error retrieving feedback terms: {e}")
+        top_terms = []
+
+    return top_terms
+
+@timed('sql.rebuild_feedback_index')
+def rebuild_feedback_index(batch_size=1000):
+    """
+    Recomputes FeedbackTerms and FeedbackBigrams from all stored feedback.
+    Only needed once after creating the tables, or after changing the
+    tokenization in feedback_module.
+
+    Returns:
+    - int: Number of feedback rows indexed.
+    """
+    indexed = 0
+    increments = {}
+    with get_connection_pool().connection(transaction=True) as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            'SELECT evaluation_timestamp, user_feedback FROM Evaluations WHERE user_feedback IS NOT NULL'
+        )
+        # Counts are aggregated per day and term while reading, so memory is
+        # bounded by the vocabulary rather than by the feedback volume
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            _add_feedback_increments(increments, [(row.evaluation_timestamp, row.user_feedback) for row in rows])
+            indexed += len(rows)
+
+        for table in FEEDBACK_INDEX_TABLES.values():
+            cursor.execute(f'DELETE FROM {table}')
+        cursor.fast_executemany = True
+        _write_feedback_increments(cursor, increments)
+        cursor.close()
+    return indexed
@@ -1,31 +1,51 @@
 # Import necessary libraries
 import streamlit as st
 from sql_module import (
-    get_metadata_from_sql,
+    get_cached_metadata,
     update_metadata_steps,
     insert_evaluation,
-    get_evaluations
+    get_evaluation_summary,
+    get_evaluation_time_histogram,
+    get_evaluations_page,
+    get_top_feedback_terms
 )
-from collections import Counter
-from openai_module import send_to_openai
-from aws_module import get_files_from_s3
-import tempfile
-import PyPDF2
-import docx
+from openai_module import stream_from_openai
+from prompt_module import build_prompt
+from aws_module import get_s3_catalog
+from artifact_module import artifact_stats
+from cache_module import get_extraction_cache
+from pipeline_module import process_task_files
+from metrics_module import get_metrics_registry, start_exporters
 import pandas as pd
-import zipfile
 import os
-import openpyxl
 import plotly.express as px
 from dotenv import load_dotenv
 import boto3
-import easyocr
 import base64
-import re
+import datetime
 
 # Load environment variables
 load_dotenv()
 
+# Prometheus endpoint / file for the stage timings, if METRICS_PORT or
+# METRICS_FILE is set (started once per process)
+start_exporters()
+
+# Maximum characters of extracted text taken from a single attachment;
+# extraction stops reading the file once this much context is available
+EXTRACTION_MAX_CHARS = int(os.getenv('EXTRACTION_MAX_CHARS', 400000))
+
+# Rows per page of the Detailed Evaluations table
+EVALUATIONS_PAGE_SIZE = int(os.getenv('EVALUATIONS_PAGE_SIZE', 50))
+
+# Time windows of the feedback themes chart (days, None = all time)
+FEEDBACK_WINDOWS = {
+    "All time": None,
+    "Last 7 days": 7,
+    "Last 30 days": 30,
+    "Last 90 days": 90
+}
+
 # Define a consistent color palette
 COLOR_PALETTE = {
     'green': '#2ca02c',
@@ -37,129 +57,6 @@ COLOR_PALETTE = {
     'grey': '#7f7f7f'
 }
 
-# Supported file types
-SUPPORTED_EXTENSIONS = [
-    '.json', '.pdf', '.png', '.jpeg', '.jpg', '.txt',
-    '.xlsx', '.csv', '.pptx', '.docx', '.py', '.zip', '.pdb'
-]
-
-# Initialize EasyOCR reader
-reader = easyocr.Reader(['en'], gpu=False)
-
-# Function to extract text from different file types
-def extract_text_from_file(file_path):
-    _, ext = os.path.splitext(file_path)
-    ext = ext.lower()
-
-    try:
-        if ext == '.txt':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-
-        elif ext == '.pdf':
-            text = ""
-            with open(file_path, 'rb') as f:
-                reader_pdf = PyPDF2.PdfReader(f)
-                for page in reader_pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            return text
-
-        elif ext == '.docx':
-            doc = docx.Document(file_path)
-            return "\n".join([para.text for para in doc.paragraphs])
-
-        elif ext == '.csv':
-            df = pd.read_csv(file_path)
-            return df.to_csv(index=False)
-
-        elif ext == '.xlsx':
-            try:
-                df = pd.read_excel(file_path, engine='openpyxl')
-                # Optionally display the dataframe
-                # st.dataframe(df.head())
-
-                # Convert the dataframe to a CSV string
-                csv_representation = df.to_csv(index=False)
-                return csv_representation
-
-            except Exception as e:
-                st.error(f"Error processing Excel file: {e}")
-                return f"Error processing Excel file: {e}"
-
-        elif ext in ['.png', '.jpg', '.jpeg']:
-            try:
-                # Use EasyOCR to extract text from the image
-                result = reader.readtext(file_path, detail=0)
-                text = ' '.join(result)
-                return text
-            except Exception as e:
-                st.error(f"Error processing image file: {e}")
-                return f"Error processing image file: {e}"
-
-        elif ext == '.py':
-            return extract_text_from_py(file_path)
-
-        elif ext == '.zip':
-            return extract_text_from_zip(file_path)
-
-        elif ext == '.pdb':
-            return extract_text_from_pdb(file_path)
-
-        elif ext == '.pptx':
-            from pptx import Presentation
-            prs = Presentation(file_path)
-            text_runs = []
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        text_runs.append(shape.text)
-            return "\n".join(text_runs)
-
-        else:
-            return f"Unsupported file type: {ext}"
-
-    except Exception as e:
-        return f"Error processing file: {e}"
-
-# Helper function to extract text from .py files
-def extract_text_from_py(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except UnicodeDecodeError:
-        with open(file_path, 'r', encoding='latin-1') as f:
-            return f.read()
-    except Exception as e:
-        return f"Error processing .py file: {e}"
-
-# Helper function to extract text from .zip files
-def extract_text_from_zip(file_path):
-    text = ""
-    with zipfile.ZipFile(file_path, 'r') as zip_ref:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            zip_ref.extractall(tmpdir)
-            for root, _, files in os.walk(tmpdir):
-                for file in files:
-                    file_path_inner = os.path.join(root, file)
-                    _, ext_inner = os.path.splitext(file_path_inner)
-                    ext_inner = ext_inner.lower()
-                    if ext_inner in SUPPORTED_EXTENSIONS:
-                        extracted_text = extract_text_from_file(file_path_inner)
-                        text += f"Extracted from {file}:\n{extracted_text}\n"
-                    else:
-                        text += f"Skipped unsupported file: {file}\n"
-    return text
-
-# Helper function to extract text from .pdb files
-def extract_text_from_pdb(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return f"Error processing .pdb file: {e}"
-
 # Initialize Streamlit session state
 def initialize_session_state():
     session_keys = [
@@ -180,6 +77,9 @@ def initialize_session_state():
                 st.session_state[key] = False
             else:
                 st.session_state[key] = ""
+    # Keyset cursors of the Detailed Evaluations pages visited so far
+    if 'evaluations_page_cursors' not in st.session_state:
+        st.session_state.evaluations_page_cursors = []
 
 initialize_session_state()
 
@@ -277,6 +177,16 @@ with st.sidebar:
     st.markdown("---")
     st.header("Settings")
     # Future settings can be added here
+    bypass_response_cache = st.checkbox(
+        "Bypass response cache",
+        value=False,
+        help="Send the prompt to OpenAI even if an identical request was answered before."
+    )
+    show_timings = st.checkbox(
+        "Show timings",
+        value=False,
+        help="Latency per stage (S3, extraction, OpenAI, SQL) aggregated since the server started."
+    )
 
 # Main Page Header
 st.markdown("""
@@ -290,24 +200,16 @@ st.markdown("---")
 # Main Content Container
 with st.container():
     # 1. Get metadata task_ids and questions from SQL Server
-    metadata = get_metadata_from_sql()
-    metadata_task_ids = [record['task_id'] for record in metadata]
-    questions_dict = {record['task_id']: record['Question'] for record in metadata}
-    final_answers_dict = {record['task_id']: record['Final answer'] for record in metadata}
-    steps_dict = {record['task_id']: record['Steps'] for record in metadata}
-
-    # 2. Get files from AWS S3 and create a mapping of task_ids to their files
+    # (served from a process-wide cache that is refreshed when Steps change)
+    metadata = get_cached_metadata()
+    metadata_task_ids = metadata['task_ids']
+    questions_dict = metadata['questions']
+    final_answers_dict = metadata['final_answers']
+    steps_dict = metadata['steps']
+
+    # 2. Get the catalog of task files in AWS S3 (indexed locally, refreshed in the background)
     bucket_name = os.getenv('AWS_BUCKET')
-    s3_files = get_files_from_s3(bucket_name)
-
-    # Create a mapping from task_id to list of files (in case there are multiple files per task_id)
-    task_files_mapping = {}
-    for file_name in s3_files:
-        # Extract task_id and file extension
-        file_base_name, file_ext = os.path.splitext(file_name)
-        if file_base_name not in task_files_mapping:
-            task_files_mapping[file_base_name] = []
-        task_files_mapping[file_base_name].append({'file_name': file_name, 'file_ext': file_ext.lower()})
+    s3_catalog = get_s3_catalog(bucket_name)
 
     # 3. Include all task IDs from metadata
     all_task_ids = metadata_task_ids  # Include all task IDs, even those without files
@@ -327,36 +229,25 @@ with st.container():
         bucket_name = os.getenv('AWS_BUCKET')
 
         # Get the list of files associated with the selected task_id
-        files_info = task_files_mapping.get(selected_task_id, [])
+        files_info = s3_catalog.files_for_task(selected_task_id)
 
         # Initialize extracted_text
         extracted_text = ""
 
         # Process the files if any
         if files_info:
-            for file_info in files_info:
-                file_name = file_info['file_name']
-                file_ext = file_info['file_ext']
-
-                file_key = file_name  # The key in S3 is the file name
-
-                # Retrieve and process the file from S3
-                try:
-                    if file_ext in SUPPORTED_EXTENSIONS:
-                        # Download the file locally
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-                            s3_client.download_fileobj(bucket_name, file_key, tmp_file)
-                            tmp_file_path = tmp_file.name
-
-                        # Extract text from the file
-                        file_extracted_text = extract_text_from_file(tmp_file_path)
-                        extracted_text += f"Extracted Text from {file_name}:\n{file_extracted_text}\n"
-
-                    else:
-                        st.write(f"Skipping unsupported file type for {file_name}")
-
-                except Exception as e:
-                    st.error(f"Error retrieving or processing the file {file_name} from S3: {e}")
+            # Download and extract all files concurrently; results keep file order
+            file_results = process_task_files(
+                s3_client, bucket_name, files_info, max_chars=EXTRACTION_MAX_CHARS
+            )
+            for file_result in file_results:
+                file_name = file_result['file_name']
+                if file_result['skipped']:
+                    st.write(f"Skipping unsupported file type for {file_name}")
+                elif file_result['error'] is not None:
+                    st.error(f"Error retrieving or processing the file {file_name} from S3: {file_result['error']}")
+                else:
+                    extracted_text += f"Extracted Text from {file_name}:\n{file_result['text']}\n"
 
         else:
             st.write("No associated files to process for this task.")
@@ -370,30 +261,27 @@ with st.container():
             st.session_state.final_answer = final_answer
             st.session_state.steps = steps
 
-            # Combine prompt with steps and extracted text if available
-            prompt = f"Steps:\n{steps}\n\nQuestion:\n{question}\n"
-            if extracted_text:
-                prompt += f"\nExtracted Text:\n{extracted_text}"
-
-            # Send to OpenAI and get response
-            with st.spinner("Sending request to OpenAI..."):
-                try:
-                    result = send_to_openai(prompt)
-                    st.session_state.openai_response = result
+            # Send to OpenAI and render the response as it streams in
+            try:
+                with st.spinner("Preparing the prompt..."):
+                    # Combine prompt with steps and extracted text, within the token budget
+                    prompt = build_prompt(
+                        steps, question, extracted_text, use_cache=not bypass_response_cache
+                    )
 
-                    # Display OpenAI's response
-                    st.markdown("### OpenAI's Response")
-                    st.write(result)
+                st.markdown("### OpenAI's Response")
+                result = st.write_stream(stream_from_openai(prompt, use_cache=not bypass_response_cache))
+                st.session_state.openai_response = result
 
-                    # Display Final Answer
-                    st.markdown("### Final Answer from Metadata")
-                    st.write(final_answer)
+                # Display Final Answer
+                st.markdown("### Final Answer from Metadata")
+                st.write(final_answer)
 
-                    # Reset rerun and feedback states
-                    st.session_state.awaiting_rerun_satisfaction = False
-                    st.session_state.awaiting_feedback = False
-                except Exception as e:
-                    st.error(f"An error occurred while communicating with OpenAI: {e}")
+                # Reset rerun and feedback states
+                st.session_state.awaiting_rerun_satisfaction = False
+                st.session_state.awaiting_feedback = False
+            except Exception as e:
+                st.error(f"An error occurred while communicating with OpenAI: {e}")
 
     # 7. User feedback on OpenAI response
     if (
@@ -465,30 +353,28 @@ with st.container():
     # 9. Show rerun model button if steps are modified
     if st.session_state.show_rerun_button and not st.session_state.awaiting_feedback:
         if st.button("Rerun Model", key="rerun_model_button"):
-            # Combine prompt with modified steps and extracted text
-            prompt = f"Steps:\n{st.session_state.modified_steps}\n\nQuestion:\n{question}\n"
-            if extracted_text:
-                prompt += f"\nExtracted Text:\n{extracted_text}"
-
-            # Send to OpenAI and get new response
-            with st.spinner("Rerunning the model with modified steps..."):
-                try:
-                    new_result = send_to_openai(prompt)
-                    st.session_state.openai_response = new_result
+            # Send to OpenAI and render the new response as it streams in
+            try:
+                with st.spinner("Rerunning the model with modified steps..."):
+                    # Combine prompt with modified steps and extracted text, within the token budget
+                    prompt = build_prompt(
+                        st.session_state.modified_steps, question, extracted_text,
+                        use_cache=not bypass_response_cache
+                    )
 
-                    # Display new OpenAI's response
-                    st.markdown("### New OpenAI's Response")
-                    st.write(new_result)
+                st.markdown("### New OpenAI's Response")
+                new_result = st.write_stream(stream_from_openai(prompt, use_cache=not bypass_response_cache))
+                st.session_state.openai_response = new_result
 
-                    # Optionally, display Final Answer again
-                    st.markdown("### Final Answer from Metadata")
-                    st.write(final_answers_dict[selected_task_id])
+                # Optionally, display Final Answer again
+                st.markdown("### Final Answer from Metadata")
+                st.write(final_answers_dict[selected_task_id])
 
-                    # Reset rerun button and set flag to await satisfaction
-                    st.session_state.show_rerun_button = False
-                    st.session_state.awaiting_rerun_satisfaction = True
-                except Exception as e:
-                    st.error(f"An error occurred while rerunning the model: {e}")
+                # Reset rerun button and set flag to await satisfaction
+                st.session_state.show_rerun_button = False
+                st.session_state.awaiting_rerun_satisfaction = True
+            except Exception as e:
+                st.error(f"An error occurred while rerunning the model: {e}")
 
     # 10. Handle Satisfaction Prompt After Rerun
     if (
@@ -561,15 +447,14 @@ with st.container():
     st.markdown("---")
     st.header("Evaluation Reports and Visualizations")
 
-    # Fetch evaluations data
-    evaluations = get_evaluations()
-    if evaluations:
-        eval_df = pd.DataFrame(evaluations)
-
+    # Summary counts and histogram bins are computed in SQL; only the
+    # aggregates and one page of the detail table are fetched per rerun
+    summary = get_evaluation_summary()
+    if summary['total']:
         # Display basic metrics
-        total_evaluations = len(eval_df)
-        correct_answers = eval_df['is_correct'].sum()
-        incorrect_answers = total_evaluations - correct_answers
+        total_evaluations = summary['total']
+        correct_answers = summary['correct']
+        incorrect_answers = summary['incorrect']
 
         st.subheader("Summary Metrics")
         col1, col2, col3 = st.columns(3)
@@ -597,19 +482,20 @@ with st.container():
         st.plotly_chart(fig_pie, use_container_width=True)
 
         # New Chart 1: Top 5 Most Common Feedback Themes
-        # Simple text processing for feedback
-        feedback_text = " ".join(eval_df['user_feedback'].dropna().tolist())
-        # Remove non-alphabetic characters and lowercase
-        words = re.findall(r'\b\w+\b', feedback_text.lower())
-        # Define a list of stopwords (extend as needed)
-        stopwords = set([
-            'the', 'and', 'is', 'in', 'it', 'of', 'to', 'a', 'for', 'on',
-            'with', 'as', 'this', 'that', 'but', 'be', 'have', 'are', 'was',
-            'were', 'or', 'an', 'at', 'by', 'from', 'not', 'your', 'you'
-        ])
-        filtered_words = [word for word in words if word not in stopwords]
-        word_counts = Counter(filtered_words)
-        top_feedback = word_counts.most_common(5)
+        # Counts come from the feedback term index maintained at insert time
+        col_window, col_phrases = st.columns([2, 1])
+        feedback_window = col_window.selectbox(
+            "Feedback period",
+            list(FEEDBACK_WINDOWS),
+            key="feedback_window"
+        )
+        show_bigrams = col_phrases.checkbox("Two-word phrases", key="feedback_bigrams")
+        window_days = FEEDBACK_WINDOWS[feedback_window]
+        top_feedback = get_top_feedback_terms(
+            limit=5,
+            since=datetime.date.today() - datetime.timedelta(days=window_days - 1) if window_days else None,
+            bigrams=show_bigrams
+        )
         feedback_labels, feedback_values = zip(*top_feedback) if top_feedback else ([], [])
 
         if feedback_labels:
@@ -639,40 +525,81 @@ with st.container():
             st.write("No feedback available to display common themes.")
 
         # New Chart 2: Average Time Between Evaluations
-        # Calculate time differences
-        if 'evaluation_timestamp' in eval_df.columns:
-            eval_df['evaluation_timestamp'] = pd.to_datetime(eval_df['evaluation_timestamp'])
-            eval_df = eval_df.sort_values('evaluation_timestamp')
-            eval_df['time_diff'] = eval_df['evaluation_timestamp'].diff().dt.total_seconds() / 60  # in minutes
-            average_time_diff = eval_df['time_diff'].mean()
-            st.subheader("Average Time Between Evaluations")
-            if pd.notnull(average_time_diff):
-                fig_time = px.histogram(
-                eval_df,
+        # Time differences are binned in SQL (LAG over evaluation_timestamp)
+        histogram = get_evaluation_time_histogram(bins=30)
+        st.subheader("Average Time Between Evaluations")
+        if histogram['average_minutes'] is not None:
+            st.write(f"Average: {histogram['average_minutes']:.2f} minutes")
+            bins_df = pd.DataFrame(histogram['bins'])
+            bins_df['time_diff'] = (bins_df['start'] + bins_df['end']) / 2
+            fig_time = px.bar(
+                bins_df,
                 x='time_diff',
-                nbins=30,
+                y='count',
                 title='Distribution of Time Differences Between Evaluations',
-                labels={'time_diff': 'Time Difference (minutes)'},
+                labels={'time_diff': 'Time Difference (minutes)', 'count': 'count'},
                 template='plotly_white',
                 color_discrete_sequence=['#ff0000']  # Red color for bars
             )
-                fig_time.update_layout(
+            fig_time.update_traces(width=(bins_df['end'] - bins_df['start']).max() or None)
+            fig_time.update_layout(
                 paper_bgcolor='#000000',  # Black background for the chart area
                 plot_bgcolor='#000000',   # Black background for the plot area
                 font=dict(color='#ffffff'),  # White font color for chart text
-                title_font=dict(size=20, color='#ffffff')  # White for title
+                title_font=dict(size=20, color='#ffffff'),  # White for title
+                bargap=0
             )
-                st.plotly_chart(fig_time, use_container_width=True)
-            else:
-                st.write("Not enough data to calculate time differences.")
+            st.plotly_chart(fig_time, use_container_width=True)
         else:
-            st.write("Evaluation timestamps not available for time-based analysis.")
+            st.write("Not enough data to calculate time differences.")
 
-        # Table of Evaluations
+        # Table of Evaluations, one keyset page at a time (newest first).
+        # evaluations_page_cursors holds the before_id of every page visited.
         st.subheader("Detailed Evaluations")
+        cursors = st.session_state.evaluations_page_cursors
+        page, has_more = get_evaluations_page(
+            before_id=cursors[-1] if cursors else None,
+            page_size=EVALUATIONS_PAGE_SIZE
+        )
         st.dataframe(
-            eval_df[['evaluation_id', 'task_id', 'is_correct', 'user_feedback', 'evaluation_timestamp']],
+            pd.DataFrame(
+                page,
+                columns=['evaluation_id', 'task_id', 'is_correct', 'user_feedback', 'evaluation_timestamp']
+            ),
             height=300
         )
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        if col_prev.button("Previous", key="evaluations_prev_page", disabled=not cursors):
+            cursors.pop()
+            st.rerun()
+        col_page.caption(f"Page {len(cursors) + 1} of {-(-total_evaluations // EVALUATIONS_PAGE_SIZE)}")
+        if col_next.button("Next", key="evaluations_next_page", disabled=not has_more):
+            cursors.append(page[-1]['evaluation_id'])
+            st.rerun()
     else:
         st.write("No evaluations recorded yet.")
+
+# Extraction cache and artifact counters (rendered last so they include this run)
+cache_stats = get_extraction_cache().stats()
+st.sidebar.caption(
+    f"Extraction cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+    f"({cache_stats['hit_rate'] * 100:.0f}% hit rate)"
+)
+artifact_counts = artifact_stats()
+st.sidebar.caption(
+    f"Precomputed artifacts: {artifact_counts['hits']} hits, {artifact_counts['misses']} misses "
+    f"({artifact_counts['hit_rate'] * 100:.0f}% hit rate)"
+)
+
+# Stage timings panel (process-wide histograms, see metrics_module)
+if show_timings:
+    st.markdown("---")
+    st.header("Timings")
+    timing_rows = get_metrics_registry().summary()
+    if timing_rows:
+        timings_df = pd.DataFrame(timing_rows)
+        for column in ['total_seconds', 'mean_seconds', 'p50_seconds', 'p95_seconds']:
+            timings_df[column.replace('_seconds', ' (ms)')] = (timings_df.pop(column) * 1000).round(1)
+        st.dataframe(timings_df, height=300)
+    else:
+        st.write("No timings recorded yet.")
@@ -0,0 +1,53 @@
+"""
+Precomputed extraction artifacts against a moto S3 bucket.
+"""
+import pytest
+
+moto = pytest.importorskip("moto")
+
+import boto3
+
+import pipeline_module
+from artifact_module import artifact_key, get_extraction_artifact, put_extraction_artifact
+
+BUCKET = 'gaia-attachments'
+
+
+@pytest.fixture
+def s3(monkeypatch, tmp_path):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('EXTRACTION_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr('cache_module._extraction_cache', None)
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key='task.txt', Body=b'live text')
+        yield client
+
+
+def _file_info(s3):
+    etag = s3.head_object(Bucket=BUCKET, Key='task.txt')['ETag']
+    return {'file_name': 'task.txt', 'file_ext': '.txt', 'etag': etag}
+
+
+def test_artifact_is_served(s3):
+    info = _file_info(s3)
+    put_extraction_artifact(s3, BUCKET, 'task.txt', info['etag'], 'precomputed text')
+    [result] = pipeline_module.process_task_files(s3, BUCKET, [info])
+    assert result['text'] == 'precomputed text'
+
+
+def test_corrupt_artifact_falls_back_to_live_extraction(s3):
+    info = _file_info(s3)
+    s3.put_object(Bucket=BUCKET, Key=artifact_key('task.txt', info['etag']), Body=b'not gzip')
+    assert get_extraction_artifact(s3, BUCKET, 'task.txt', info['etag']) is None
+    [result] = pipeline_module.process_task_files(s3, BUCKET, [info])
+    assert result['error'] is None
+    assert result['text'] == 'live text'
+
+
+def test_settings_change_misses_artifact(s3, monkeypatch):
+    info = _file_info(s3)
+    put_extraction_artifact(s3, BUCKET, 'task.txt', info['etag'], 'full mode text')
+    monkeypatch.setenv('TABULAR_MODE', 'summary')
+    assert get_extraction_artifact(s3, BUCKET, 'task.txt', info['etag']) is None
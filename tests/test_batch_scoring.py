@@ -0,0 +1,28 @@
+"""
+batch_eval scores only the explicit final-answer line.
+"""
+import pytest
+
+pytest.importorskip("pyodbc")
+
+from batch_eval import extract_final_answer, is_response_correct
+
+
+@pytest.mark.parametrize('response, final_answer, correct', [
+    ("FINAL ANSWER: 3", "3", True),
+    ("Step 1 of 3: count the rows.\nFINAL ANSWER: 4", "3", False),
+    ("The answer is 3", "3", False),
+    ("Final answer: $1,234.50", "1234.5", True),
+    ("FINAL ANSWER: 17000", "17,000", True),
+    ("FINAL ANSWER: 0.1+", "0.1", False),
+    ("FINAL ANSWER: Paris.", "paris", True),
+    ("FINAL ANSWER: yes, probably", "yes", False),
+    ("FINAL ANSWER: 1; 2; 3", "1, 2, 3", True),
+    ("FINAL ANSWER: b, a", "a, b", False),
+])
+def test_is_response_correct(response, final_answer, correct):
+    assert is_response_correct(response, final_answer) is correct
+
+
+def test_last_final_answer_line_wins():
+    assert extract_final_answer("FINAL ANSWER: draft\nOn reflection:\nFINAL ANSWER: 42") == "42"
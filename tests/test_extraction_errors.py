@@ -0,0 +1,53 @@
+"""
+Extraction failures are raised, never returned as (partial) text.
+"""
+import zipfile
+
+import pytest
+
+from extraction_module import (
+    DEFAULT_CHUNK_CHARS, EXTRACTOR_MODULES, SUPPORTED_EXTENSIONS, ExtractionError, extract_text_from_file,
+    iter_text_from_file
+)
+
+
+@pytest.fixture
+def bad_utf8_txt(tmp_path):
+    # Valid text for more than one chunk, then an invalid byte
+    path = tmp_path / "broken.txt"
+    path.write_bytes(b"a" * (2 * DEFAULT_CHUNK_CHARS) + b"\xff" + b"b" * 100)
+    return str(path)
+
+
+def test_failure_after_chunks_raises(bad_utf8_txt):
+    chunks = []
+    with pytest.raises(ExtractionError):
+        for chunk in iter_text_from_file(bad_utf8_txt):
+            chunks.append(chunk)
+    assert chunks and not any("Error processing" in chunk for chunk in chunks)
+
+
+def test_extract_text_returns_no_partial_text(bad_utf8_txt):
+    with pytest.raises(ExtractionError, match="Error processing file"):
+        extract_text_from_file(bad_utf8_txt)
+
+
+def test_unsupported_type_raises(tmp_path):
+    path = tmp_path / "audio.mp3"
+    path.write_bytes(b"ID3")
+    with pytest.raises(ExtractionError, match="Unsupported file type: .mp3"):
+        extract_text_from_file(str(path))
+
+
+def test_every_supported_type_has_an_extractor():
+    assert set(SUPPORTED_EXTENSIONS) <= set(EXTRACTOR_MODULES)
+
+
+def test_zip_with_json_member(tmp_path):
+    path = tmp_path / "attachments.zip"
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr("notes.txt", "some notes")
+        archive.writestr("data.json", '{"answer": 42}')
+    text = extract_text_from_file(str(path))
+    assert "some notes" in text
+    assert '{"answer": 42}' in text
@@ -0,0 +1,22 @@
+"""
+Output-affecting settings are part of the extraction cache key.
+"""
+import pytest
+
+from extraction_module import EXTRACTOR_VERSION, OUTPUT_SETTINGS, extraction_settings_key
+
+
+@pytest.mark.parametrize('name, value', [('TABULAR_MODE', 'summary'), ('PDF_OCR_FALLBACK', '0')])
+def test_setting_changes_key(monkeypatch, name, value):
+    for setting in OUTPUT_SETTINGS:
+        monkeypatch.delenv(setting, raising=False)
+    default_key = extraction_settings_key()
+    monkeypatch.setenv(name, value)
+    assert extraction_settings_key() != default_key
+    assert extraction_settings_key().startswith(f"{EXTRACTOR_VERSION}-")
+
+
+def test_unrelated_setting_keeps_key(monkeypatch):
+    key = extraction_settings_key()
+    monkeypatch.setenv('PDF_WORKERS', '16')
+    assert extraction_settings_key() == key
@@ -0,0 +1,72 @@
+"""
+Evaluations are kept when the feedback term index tables are missing.
+"""
+import datetime
+from contextlib import contextmanager
+
+import pytest
+
+pyodbc = pytest.importorskip("pyodbc")
+
+import sql_module
+
+
+class FakeCursor:
+    """Records statements; MERGE fails as if migration 004 was not applied."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, *params):
+        self.db['statements'].append(sql.strip().split()[0])
+
+    def executemany(self, sql, rows):
+        if 'MERGE' in sql:
+            raise pyodbc.ProgrammingError("Invalid object name 'FeedbackTerms'.")
+        self.db['pending'].extend(rows)
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, db):
+        self.db = db
+
+    @contextmanager
+    def connection(self, transaction=False):
+        try:
+            yield type('FakeConnection', (), {'cursor': lambda _self: FakeCursor(self.db)})()
+        except Exception:
+            self.db['pending'] = []
+            raise
+        self.db['committed'].extend(self.db['pending'])
+        self.db['pending'] = []
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = {'statements': [], 'pending': [], 'committed': []}
+    monkeypatch.setattr(sql_module, 'get_connection_pool', lambda: FakePool(db))
+    monkeypatch.setattr(sql_module, '_feedback_index_available', True)
+    return db
+
+
+def test_bulk_insert_survives_missing_index(db):
+    evaluations = [
+        {'task_id': 'a', 'is_correct': True, 'user_feedback': 'wrong units'},
+        {'task_id': 'b', 'is_correct': False, 'user_feedback': 'missed the table'},
+    ]
+    assert sql_module.insert_evaluations_bulk(evaluations)
+    assert [row[0] for row in db['committed']] == ['a', 'b']
+    assert db['statements'] == ['SAVE', 'ROLLBACK']
+
+    # Later inserts skip the index instead of failing again
+    assert sql_module.insert_evaluations_bulk(evaluations[:1])
+    assert len(db['committed']) == 3
+    assert db['statements'] == ['SAVE', 'ROLLBACK']
+
+
+def test_automatic_scores_are_not_indexed():
+    rows = [(datetime.datetime(2026, 1, 1), sql_module.AUTOMATIC_EVALUATION_FEEDBACK)]
+    assert sql_module._add_feedback_increments({}, rows) == {}
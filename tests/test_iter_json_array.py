@@ -0,0 +1,27 @@
+"""
+Streaming metadata.json parsing across read boundaries.
+"""
+import json
+
+import pytest
+
+pytest.importorskip("pyodbc")
+
+from upload_metadata_rdb import iter_json_array
+
+ELEMENTS = [12345678, -1.5e10, 12.5, True, None, "a, b]", {"task_id": "x", "Steps": [1, 2]}, [], 0]
+
+
+@pytest.mark.parametrize('chunk_chars', [1, 2, 3, 7, 64])
+def test_elements_split_across_reads(tmp_path, chunk_chars):
+    path = tmp_path / "metadata.json"
+    path.write_text(' [ ' + ' ,\n '.join(json.dumps(element) for element in ELEMENTS * 3) + ' ]\n')
+    assert list(iter_json_array(str(path), chunk_chars=chunk_chars)) == ELEMENTS * 3
+
+
+@pytest.mark.parametrize('content', ['{"task_id": "x"}', '[1, 2', '[12.x]'])
+def test_invalid_array_raises(tmp_path, content):
+    path = tmp_path / "metadata.json"
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), chunk_chars=2))
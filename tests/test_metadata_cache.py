@@ -0,0 +1,84 @@
+"""
+MetadataCache refreshes against a fake pyodbc cursor.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("pyodbc")
+
+import sql_module
+
+Row = namedtuple('Row', [
+    'task_id', 'Question', 'Level', 'Final_answer', 'Steps', 'Number_of_steps',
+    'How_long_did_this_take', 'Tools', 'Number_of_tools', 'row_version'
+])
+
+
+def make_row(task_id, row_version, steps="steps"):
+    return Row(task_id, f"question {task_id}", 1, "answer", steps, 1, "1 minute", "none", 0, row_version)
+
+
+class FakeCursor:
+    """Answers the MetadataCache queries from an in-memory Tasks table."""
+
+    def __init__(self, table):
+        self.table = table
+        self._results = []
+
+    def execute(self, sql, *params):
+        if 'WHERE row_version > ?' in sql:
+            changed = [row for row in self.table.values() if row.row_version > params[0]]
+            self._results = [changed, [(len(self.table),)]]
+        else:
+            self._results = [list(self.table.values())]
+
+    def fetchall(self):
+        return self._results[0]
+
+    def fetchone(self):
+        return self._results[0][0]
+
+    def nextset(self):
+        self._results.pop(0)
+        return bool(self._results)
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, table):
+        self.table = table
+
+    @contextmanager
+    def connection(self, transaction=False):
+        yield type('FakeConnection', (), {'cursor': lambda _self: FakeCursor(self.table)})()
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = {'a': make_row('a', 1), 'b': make_row('b', 2)}
+    monkeypatch.setattr(sql_module, 'get_connection_pool', lambda: FakePool(table))
+    return table
+
+
+def test_incremental_refresh_picks_up_changed_rows(table):
+    cache = sql_module.MetadataCache(ttl=3600)
+    assert cache.get()['task_ids'] == ['a', 'b']
+
+    table['a'] = make_row('a', 3, steps="new steps")
+    cache.invalidate('a')
+    assert cache.get()['steps']['a'] == "new steps"
+
+
+def test_delete_only_refresh_rebuilds_index(table):
+    cache = sql_module.MetadataCache(ttl=3600)
+    assert cache.get()['task_ids'] == ['a', 'b']
+
+    del table['b']
+    cache.invalidate()
+    index = cache.get()
+    assert index['task_ids'] == ['a']
+    assert 'b' not in index['questions']
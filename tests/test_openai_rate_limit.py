@@ -0,0 +1,49 @@
+"""
+Failed OpenAI attempts give their reserved tokens back to the rate limiter.
+"""
+import httpx
+import openai
+import pytest
+
+import openai_module
+
+
+def _rate_limit_error():
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    return openai.RateLimitError("Rate limit reached", response=httpx.Response(429, request=request), body=None)
+
+
+class FailingCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise _rate_limit_error()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = openai_module.OpenAIClient(max_retries=2, tokens_per_minute=30000)
+    completions = FailingCompletions()
+    fake = type('FakeOpenAI', (), {'chat': type('Chat', (), {'completions': completions})()})()
+    monkeypatch.setattr(client, '_get_client', lambda: fake)
+    monkeypatch.setattr(openai_module, '_backoff_delay', lambda attempt, exc: 0)
+    return client, completions
+
+
+def test_retries_do_not_drain_the_token_bucket(client):
+    client, completions = client
+    prompt = "x" * 20000
+    with pytest.raises(openai_module.OpenAIRateLimitError):
+        client.complete(prompt, system_prompt="", max_tokens=0, use_cache=False)
+    assert completions.calls == 3
+    assert client.rate_limiter.tokens.tokens == pytest.approx(30000)
+
+
+def test_failed_stream_gives_tokens_back(client):
+    client, completions = client
+    with pytest.raises(openai_module.OpenAIRateLimitError):
+        list(client.stream("x" * 20000, system_prompt="", max_tokens=0, use_cache=False))
+    assert completions.calls == 3
+    assert client.rate_limiter.tokens.tokens == pytest.approx(30000)
@@ -0,0 +1,31 @@
+"""
+build_prompt summarizes through the shared sync client, without an event loop.
+"""
+import prompt_module
+
+
+class FakeClient:
+    def __init__(self):
+        self.prompts = []
+
+    def complete(self, prompt, max_tokens, use_cache):
+        self.prompts.append(prompt)
+        return "summary"
+
+    async def acomplete(self, prompt, max_tokens, use_cache):
+        raise AssertionError("build_prompt must not use the async client")
+
+
+def test_oversized_text_is_summarized_with_sync_client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(prompt_module, 'get_openai_client', lambda: client)
+    monkeypatch.setattr(prompt_module, 'count_tokens', lambda text: len(text) // 4)
+    monkeypatch.setattr(prompt_module, 'split_tokens', lambda text, chunk_tokens: [
+        text[start:start + chunk_tokens * 4] for start in range(0, len(text), chunk_tokens * 4)
+    ])
+
+    prompt = prompt_module.build_prompt("steps", "question", "x" * 200_000, token_budget=8000)
+    chunks = -(-200_000 // (prompt_module.MAP_CHUNK_TOKENS * 4))
+    assert len(client.prompts) == min(chunks, prompt_module.MAP_MAX_CHUNKS)
+    assert "Extracted Text (summarized)" in prompt
+    assert "[Part 1] summary" in prompt
@@ -0,0 +1,23 @@
+"""
+SQL Server credentials come only from the environment.
+"""
+import pytest
+
+pytest.importorskip("pyodbc")
+
+import sql_module
+
+
+def test_missing_password_fails_clearly(monkeypatch):
+    monkeypatch.setattr(sql_module, 'SQL_DATABASE', 'gaia')
+    monkeypatch.setattr(sql_module, 'SQL_PASSWORD', None)
+    with pytest.raises(RuntimeError, match="SQL_PASSWORD must be set"):
+        sql_module.get_connection_string()
+
+
+def test_connection_string_uses_environment(monkeypatch):
+    monkeypatch.setattr(sql_module, 'SQL_DATABASE', 'gaia')
+    monkeypatch.setattr(sql_module, 'SQL_PASSWORD', 'secret')
+    connection_string = sql_module.get_connection_string()
+    assert 'DATABASE=gaia;' in connection_string
+    assert 'PWD=secret;' in connection_string
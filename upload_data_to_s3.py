@@ -1,130 +1,241 @@
+"""
+Copies the GAIA validation attachments from Hugging Face to S3.
+
+Each file is streamed from the HTTP response straight into an S3 (multipart)
+upload, without touching the local disk, and several files are transferred
+concurrently. A JSON manifest records every finished transfer; files whose
+source size and ETag still match the manifest and the object in S3 are
+skipped, so an interrupted run resumes where it stopped.
+
+Both ends are replaceable for offline benchmarking: --base-url points at any
+HTTP server laid out like Hugging Face and --endpoint-url at any S3-compatible
+endpoint (e.g. a moto server).
+
+Usage:
+    python upload_data_to_s3.py [--workers 8] [--manifest upload_manifest.json]
+"""
+import argparse
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 from bs4 import BeautifulSoup
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Get Hugging Face API Token
-huggingface_token = os.getenv('HuggingFace_API_KEY')
-
-# Initialize S3 client
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-)
-
-# S3 Bucket name
-bucket_name = os.getenv('AWS_BUCKET')
-
 # Hugging Face GAIA dataset URL
-huggingface_url = "https://huggingface.co/datasets/gaia-benchmark/GAIA/tree/main/2023/validation"
+HUGGINGFACE_BASE_URL = "https://huggingface.co"
+huggingface_url = f"{HUGGINGFACE_BASE_URL}/datasets/gaia-benchmark/GAIA/tree/main/2023/validation"
 
 # Supported file types
 SUPPORTED_FILE_TYPES = ('.json', '.pdf', '.png', '.jpeg', '.jpg', '.txt', '.xlsx', '.csv', '.zip', '.tar.gz', '.mp3', '.pdb', '.pptx', '.jsonld', '.docx', '.py')
 
-# Get Windows Downloads folder path
-download_dir = os.path.join(os.path.expanduser("~"), "Downloads")
+DEFAULT_WORKERS = int(os.getenv('UPLOAD_WORKERS', 8))
+DEFAULT_MANIFEST = 'upload_manifest.json'
+
+# Multipart settings for the streamed uploads
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4
+)
+
+def make_http_session(huggingface_token=None, pool_size=DEFAULT_WORKERS):
+    """Creates an HTTP session whose connection pool fits the worker count"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if huggingface_token:
+        session.headers['Authorization'] = f"Bearer {huggingface_token}"
+    return session
+
+def make_s3_client(endpoint_url=None, pool_size=DEFAULT_WORKERS):
+    """Creates an S3 client, optionally against a local stand-in endpoint"""
+    return boto3.client(
+        's3',
+        endpoint_url=endpoint_url,
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        config=Config(max_pool_connections=pool_size * TRANSFER_CONFIG.max_request_concurrency)
+    )
 
-def get_file_urls_from_li_tags(huggingface_url):
+def get_file_urls_from_li_tags(huggingface_url, session, base_url=HUGGINGFACE_BASE_URL):
     """Retrieve all file download URLs from the Hugging Face page"""
-    headers = {
-        "Authorization": f"Bearer {huggingface_token}"
-    }
-    
-    response = requests.get(huggingface_url, headers=headers)
-    
+    response = session.get(huggingface_url)
+
     if response.status_code != 200:
         print(f"Failed to retrieve the page: {huggingface_url}, status code: {response.status_code}")
         return []
-    
+
     # Parse the HTML page
     soup = BeautifulSoup(response.text, 'html.parser')
     file_urls = []
-    
+
     # Find all <li> elements containing <a> tags, extract href attributes
     for li in soup.find_all('li'):
         link = li.find('a', href=True)
         if link:
             href = link.get('href')
-            
+
             # Filter URLs with supported file types
             if href and any(href.endswith(ext) for ext in SUPPORTED_FILE_TYPES):
-                full_url = f"https://huggingface.co{href}".replace('/blob/', '/resolve/')
+                full_url = f"{base_url}{href}".replace('/blob/', '/resolve/')
                 file_urls.append(full_url)
-                print(f"Found matching file URL: {full_url}")  # Debug: print matching file URLs
-    
+
     if not file_urls:
         print("No matching file URLs found on the page.")
-    
+
     return file_urls
 
-def download_file(url, local_path):
-    """Download file to local"""
-    headers = {
-        "Authorization": f"Bearer {huggingface_token}"
-    }
-    
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
-            print(f"Downloaded {url} to {local_path}")
-        else:
-            print(f"Failed to download {url}. Status code: {response.status_code}")
-    except Exception as e:
-        print(f"Error downloading {url}: {e}")
-
-# def remove_supported_extensions(file_name):
-#     """Remove supported file extensions from the file name"""
-#     for ext in SUPPORTED_FILE_TYPES:
-#         if file_name.endswith(ext):
-#             return file_name[:-len(ext)]  # Strip the extension
-#     return file_name
-
-def upload_to_s3(file_path, bucket_name, s3_key):
-    """Upload file to AWS S3"""
+
+class UploadManifest:
+    """
+    JSON record of finished transfers: s3_key -> {url, size, source_etag, s3_etag}.
+    Saved atomically after every transfer so a crash loses at most the
+    transfers still in flight.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def get(self, s3_key):
+        with self._lock:
+            return self.entries.get(s3_key)
+
+    def record(self, s3_key, entry):
+        with self._lock:
+            self.entries[s3_key] = entry
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def _source_metadata(session, url):
+    """Size and ETag of the source file, from a HEAD request"""
+    response = session.head(url, allow_redirects=True)
+    response.raise_for_status()
+    size = response.headers.get('Content-Length')
+    # Hugging Face reports the content hash of LFS files as X-Linked-ETag
+    etag = response.headers.get('X-Linked-ETag') or response.headers.get('ETag')
+    return (int(size) if size is not None else None), etag
+
+def _s3_object_matches(s3_client, bucket_name, s3_key, entry, size):
     try:
-        s3_client.upload_file(file_path, bucket_name, s3_key)
-        print(f"Uploaded {file_path} to S3 bucket {bucket_name} as {s3_key}")
-    except Exception as e:
-        print(f"Error uploading {file_path} to S3: {e}")
-
-def process_files_and_upload(huggingface_url, bucket_name):
-    """Download Hugging Face files and upload to S3"""
-    file_urls = get_file_urls_from_li_tags(huggingface_url)
-    
+        head = s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+    except ClientError:
+        return False
+    return head['ETag'] == entry.get('s3_etag') and (size is None or head['ContentLength'] == size)
+
+def transfer_file(session, s3_client, bucket_name, file_url, manifest):
+    """
+    Streams one file from file_url into S3 unless it is already there.
+
+    Returns:
+    - tuple: (s3_key, bytes transferred, skipped)
+    """
+    # Get the file name and use it as the S3 key
+    s3_key = file_url.split('/')[-1]
+
+    size, source_etag = _source_metadata(session, file_url)
+    entry = manifest.get(s3_key)
+    if (
+        entry is not None
+        and entry.get('source_etag') == source_etag
+        and entry.get('size') == size
+        and _s3_object_matches(s3_client, bucket_name, s3_key, entry, size)
+    ):
+        return s3_key, 0, True
+
+    with session.get(file_url, stream=True) as response:
+        response.raise_for_status()
+        # Let urllib3 undo any transfer encoding while streaming
+        response.raw.decode_content = True
+        s3_client.upload_fileobj(response.raw, bucket_name, s3_key, Config=TRANSFER_CONFIG)
+
+    head = s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+    manifest.record(s3_key, {
+        'url': file_url,
+        'size': head['ContentLength'],
+        'source_etag': source_etag,
+        's3_etag': head['ETag']
+    })
+    return s3_key, head['ContentLength'], False
+
+def process_files_and_upload(huggingface_url, bucket_name, session, s3_client, manifest,
+                             workers=DEFAULT_WORKERS, base_url=HUGGINGFACE_BASE_URL):
+    """Stream Hugging Face files to S3 with a bounded pool of transfers"""
+    file_urls = get_file_urls_from_li_tags(huggingface_url, session, base_url)
+
     if not file_urls:
         print("No files found to download.")
-        return
-    
-    for file_url in file_urls:
-        # Get the file name and local path
-        file_name = file_url.split('/')[-1]
-        local_path = os.path.join(download_dir, file_name)  # Specify the Windows Downloads folder
-        
-        # Download file to local
-        download_file(file_url, local_path)
-        
-        # Check if the file was successfully downloaded
-        if os.path.exists(local_path):
-            print(f"File {local_path} successfully downloaded.")
-            
-            # Strip any supported file extensions from the file name
-            # file_name_without_extension = remove_supported_extensions(file_name)
-            
-            # Upload to S3 with the file name without extension
-            upload_to_s3(local_path, bucket_name, f"{file_name}")
-            
-            # Delete the local file
-            os.remove(local_path)
-            print(f"Deleted local file: {local_path}")
-        else:
-            print(f"File {local_path} not found, skipping upload.")
-
-# Execute the download and upload process
-process_files_and_upload(huggingface_url, bucket_name)
\ No newline at end of file
+        return {'uploaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+
+    stats = {'uploaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(transfer_file, session, s3_client, bucket_name, file_url, manifest): file_url
+            for file_url in file_urls
+        }
+        for future in as_completed(futures):
+            file_url = futures[future]
+            try:
+                s3_key, transferred, skipped = future.result()
+            except Exception as e:
+                print(f"Error transferring {file_url} to S3: {e}")
+                stats['failed'] += 1
+                continue
+            if skipped:
+                stats['skipped'] += 1
+                print(f"Skipped {s3_key}: already in S3 bucket {bucket_name}")
+            else:
+                stats['uploaded'] += 1
+                stats['bytes'] += transferred
+                print(f"Uploaded {file_url} to S3 bucket {bucket_name} as {s3_key}")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source-url', default=huggingface_url, help="Page listing the files to copy")
+    parser.add_argument('--base-url', default=HUGGINGFACE_BASE_URL, help="Prefix for the file links on that page")
+    parser.add_argument('--bucket', default=os.getenv('AWS_BUCKET'), help="Target S3 bucket")
+    parser.add_argument('--endpoint-url', default=os.getenv('S3_ENDPOINT_URL'), help="S3-compatible endpoint")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Concurrent transfers")
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST, help="JSON manifest used to resume")
+    args = parser.parse_args()
+
+    session = make_http_session(os.getenv('HuggingFace_API_KEY'), pool_size=args.workers)
+    s3_client = make_s3_client(args.endpoint_url, pool_size=args.workers)
+    manifest = UploadManifest(args.manifest)
+
+    # Execute the download and upload process
+    start = time.perf_counter()
+    stats = process_files_and_upload(
+        args.source_url, args.bucket, session, s3_client, manifest,
+        workers=args.workers, base_url=args.base_url
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Uploaded {stats['uploaded']}, skipped {stats['skipped']}, failed {stats['failed']} "
+        f"({stats['bytes'] / 1e6:.1f} MB in {elapsed:.1f}s)"
+    )
+
+
+if __name__ == '__main__':
+    main()
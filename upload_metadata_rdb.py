@@ -1,50 +1,218 @@
-import pyodbc
+"""
+Loads metadata.json into the Tasks table.
+
+The JSON array is parsed one record at a time, records are sent to a staging
+table in batches with fast_executemany, and a single MERGE on task_id then
+inserts new tasks and updates changed ones. Re-running the loader with the
+same file leaves the table unchanged.
+
+Usage:
+    python upload_metadata_rdb.py [--file metadata.json] [--batch-size 1000]
+"""
+import argparse
 import json
-import os
-from dotenv import load_dotenv
-
-# 加载 .env 文件中的环境变量
-load_dotenv()
-
-# 从 .env 文件中读取 SQL Server 配置信息
-server = os.getenv('SQL_SERVER')  # SQL Server 地址
-database = os.getenv('SQL_DATABASE')  # 数据库名称
-username = os.getenv('SQL_USER')  # 用户名
-password = os.getenv('SQL_PASSWORD')  # 密码
-driver = '{ODBC Driver 17 for SQL Server}'  # SQL Server ODBC 驱动
-
-# 建立 SQL Server 连接
-connection = pyodbc.connect(f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password};')
-cursor = connection.cursor()
-
-# 读取 JSON 文件
-with open('metadata.json', 'r', encoding='utf-8') as file:
-    data = json.load(file)
-
-# 插入数据到 SQL Server
-for record in data:
-    task_id = record.get('task_id', '')
-    question = record.get('Question', '')
-    level = record.get('Level', 0)
-    file_name = record.get('file_name', '')
-    final_answer = record.get('Final answer', '')
-    metadata = record.get('Annotator Metadata', {})
-    
-    steps = metadata.get('Steps', '')
-    number_of_steps = metadata.get('Number of steps', '')
-    how_long = metadata.get('How long did this take?', '')
-    tools = metadata.get('Tools', '')
-    number_of_tools = metadata.get('Number of tools', '')
-
-    # 执行 SQL 插入命令
-    cursor.execute('''
-        INSERT INTO Tasks (Question, Level, file_name, Final_answer, Steps, Number_of_steps, How_long_did_this_take, Tools, Number_of_tools)
-        VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (question, level, file_name, final_answer, steps, number_of_steps, how_long, tools, number_of_tools))
-
-# 提交事务
-connection.commit()
-
-# 关闭连接
-cursor.close()
-connection.close()
\ No newline at end of file
+import re
+import time
+
+import pyodbc
+
+from sql_module import get_connection_pool
+
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_CHARS = 1024 * 1024
+
+_WHITESPACE = re.compile(r'\s*')
+_SEPARATORS = re.compile(r'[\s,]*')
+
+# Columns written to Tasks, in parameter order
+TASK_COLUMNS = [
+    'task_id', 'Question', 'Level', 'file_name', 'Final_answer', 'Steps',
+    'Number_of_steps', 'How_long_did_this_take', 'Tools', 'Number_of_tools'
+]
+
+
+def iter_json_array(file_path, chunk_chars=READ_CHUNK_CHARS):
+    """
+    Yields the elements of a top-level JSON array without loading the whole
+    file into memory.
+
+    Elements are decoded in place at a read offset and the consumed part of
+    the buffer is only dropped once it exceeds chunk_chars, so parsing time
+    stays linear in the file size.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        buffer, pos, eof = '', 0, False
+        started = False
+        while True:
+            pos = (_SEPARATORS if started else _WHITESPACE).match(buffer, pos).end()
+            if pos == len(buffer) and not eof:
+                more = file.read(chunk_chars)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            if pos == len(buffer):
+                raise ValueError(f"{file_path} ends before its JSON array is closed")
+
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError(f"{file_path} does not contain a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+
+            # A number cut at a read boundary still decodes (e.g. "12" of
+            # "12.5"), so an element only counts once the ',' or ']' after
+            # it has been read
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+                follow = _WHITESPACE.match(buffer, end).end()
+                complete = follow < len(buffer) and buffer[follow] in ',]'
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                if eof:
+                    raise ValueError(f"{file_path} does not contain a valid JSON array")
+                more = file.read(chunk_chars)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+
+            yield element
+            pos = end
+            if pos > chunk_chars:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def record_to_row(record):
+    """
+    Maps one metadata.json record to a Tasks row (in TASK_COLUMNS order).
+    """
+    metadata = record.get('Annotator Metadata', {}) or {}
+    return (
+        record.get('task_id', ''),
+        record.get('Question', ''),
+        record.get('Level', 0),
+        record.get('file_name', ''),
+        record.get('Final answer', ''),
+        metadata.get('Steps', ''),
+        metadata.get('Number of steps', ''),
+        metadata.get('How long did this take?', ''),
+        metadata.get('Tools', ''),
+        metadata.get('Number of tools', '')
+    )
+
+
+def _create_staging_table(cursor):
+    # Same column types as Tasks, plus the position in the file so that the
+    # last occurrence of a duplicated task_id wins
+    cursor.execute(f'''
+        SELECT TOP 0 {', '.join(TASK_COLUMNS)}, CAST(0 AS INT) AS seq
+        INTO #TasksStaging
+        FROM Tasks
+    ''')
+
+
+def _merge_staging_table(cursor):
+    columns = ', '.join(TASK_COLUMNS)
+    source_columns = ', '.join(f'source.{column}' for column in TASK_COLUMNS)
+    compared_source = ', '.join(f'source.{column}' for column in TASK_COLUMNS[1:])
+    compared_target = ', '.join(f'target.{column}' for column in TASK_COLUMNS[1:])
+    updates = ', '.join(f'target.{column} = source.{column}' for column in TASK_COLUMNS[1:])
+    cursor.execute(f'''
+        MERGE Tasks AS target
+        USING (
+            SELECT {columns}
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY task_id ORDER BY seq DESC) AS rn
+                FROM #TasksStaging
+            ) AS ranked
+            WHERE rn = 1
+        ) AS source
+        ON target.task_id = source.task_id
+        WHEN MATCHED AND EXISTS (
+            SELECT {compared_source}
+            EXCEPT
+            SELECT {compared_target}
+        ) THEN
+            UPDATE SET {updates}
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT ({columns}) VALUES ({source_columns});
+    ''')
+    return cursor.rowcount
+
+
+def load_metadata(file_path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Streams file_path into Tasks with one MERGE on task_id.
+
+    Returns:
+    - tuple: (records staged, rows inserted or updated, records skipped).
+    """
+    staged = 0
+    skipped = 0
+    with get_connection_pool().connection(transaction=True) as connection:
+        cursor = connection.cursor()
+        _create_staging_table(cursor)
+
+        cursor.fast_executemany = True
+        insert_sql = f'''
+            INSERT INTO #TasksStaging ({', '.join(TASK_COLUMNS)}, seq)
+            VALUES ({', '.join('?' for _ in TASK_COLUMNS)}, ?)
+        '''
+        # Long text columns are bound as nvarchar(max)
+        cursor.setinputsizes([
+            (pyodbc.SQL_WVARCHAR, 0, 0) if column in ('Question', 'Final_answer', 'Steps', 'Tools') else None
+            for column in TASK_COLUMNS
+        ] + [None])
+
+        batch = []
+        for seq, record in enumerate(iter_json_array(file_path)):
+            row = record_to_row(record)
+            if not row[0]:
+                # Without a task_id the record cannot be merged
+                skipped += 1
+                continue
+            batch.append(row + (seq,))
+            if len(batch) >= batch_size:
+                cursor.executemany(insert_sql, batch)
+                staged += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(insert_sql, batch)
+            staged += len(batch)
+
+        cursor.close()
+
+        # Fresh cursor: the input sizes above only apply to the staging insert
+        cursor = connection.cursor()
+        changed = _merge_staging_table(cursor)
+        cursor.execute('DROP TABLE #TasksStaging')
+        cursor.close()
+
+    return staged, changed, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', default='metadata.json', help="Path of the metadata JSON array")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per executemany batch")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    staged, changed, skipped = load_metadata(args.file, args.batch_size)
+    print(
+        f"Staged {staged} records, inserted or updated {changed} tasks, "
+        f"skipped {skipped} without task_id in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == '__main__':
+    main()